@@ -15,9 +15,8 @@ from datetime import datetime, time
 import re
 from contextlib import redirect_stdout
 import logging
-import atexit
-import shutil
 import tempfile
+import zipfile
 import traceback
 from utils.url_generator import extract_event_id, generate_event_registration_url, generate_event_summary_url
 from utils.auth import validate_password, validate_username, validate_email
@@ -26,10 +25,12 @@ from utils.magazine.scheduler import db, Schedule, JobRun, schedule_manager, Eve
 from utils.badges.pre_processing_module import PreprocessingBase
 from utils.badges.event_preprocessing import preprocessing_implementations
 from utils.badges.event_preprocessing.default import DefaultPreprocessing
-from utils.badges.file_validator import FileValidator, FileTypes
 from utils.badges.convert_to_mail_merge_v3 import EventRegistrationProcessorV3
 from utils.badges.badge_generator import BadgeGenerator
-from utils.dynamics_crm import DynamicsCRMClient
+from utils.badges.excel_export import write_excel
+from utils.badges import event_statistics
+from utils.dynamics_crm import get_crm_client, crm_configured, get_request_metrics, DataPullError, BATCH_REQUESTS
+from utils.badges.campaign_cache import campaign_cache, build_frames, DATA_TYPE_FILE_TYPES, WARM_INTERVAL_SECONDS
 import os
 import json
 import pandas as pd
@@ -56,8 +57,6 @@ for dir_path in ['data', 'temp', 'downloads', 'badge_templates', 'badge_logos']:
 # Helper function to create a preprocessor class from a database template
 def create_preprocessor_from_template(template):
     """Create a dynamic preprocessor class from a database template."""
-    from utils.badges.pre_processing_module import PreprocessingBase, PreprocessingConfig
-    import pandas as pd
     
     class DynamicPreprocessor(PreprocessingBase):
         """Dynamically created preprocessor from database template."""
@@ -78,6 +77,23 @@ def create_preprocessor_from_template(template):
     
     return DynamicPreprocessor
 
+def resolve_preprocessor_class(preprocessing_template_id):
+    """Get the preprocessor class for a database template ID, or the default one."""
+    if preprocessing_template_id:
+        try:
+            template = PreprocessingTemplate.query.get(int(preprocessing_template_id))
+            if template:
+                logger.info(f"Using database preprocessing template: {template.name}")
+                # Create a dynamic preprocessor class from the database template
+                return create_preprocessor_from_template(template)
+            logger.warning(f"Preprocessing template {preprocessing_template_id} not found, using default")
+        except Exception as e:
+            logger.error(f"Error loading preprocessing template: {str(e)}")
+    
+    # Use default preprocessing (no custom mappings) if no template selected
+    logger.info("No preprocessing template selected, using default (no custom transformations)")
+    return DefaultPreprocessing
+
 # Initialize Flask app
 app = Flask(__name__)
 
@@ -153,35 +169,32 @@ with app.app_context():
 # Initialize scheduler after database setup
 schedule_manager.init_app(app)  # This will use replace_existing=True by default
 
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+def warm_open_campaigns():
+    """Pre-pull and pre-merge every open campaign so Pull & Process starts warm."""
+    campaign_cache.warm(get_crm_client())
 
-def create_persistent_temp_dir():
-    """Create a persistent temporary directory that won't be automatically cleaned up."""
-    # Create a base temporary directory that persists
-    base_dir = os.path.join(tempfile.gettempdir(), 'convention_badges_uploads')
-    os.makedirs(base_dir, mode=0o777, exist_ok=True)
-    
-    # Create a unique subdirectory for this session
-    session_dir = tempfile.mkdtemp(dir=base_dir)
-    os.chmod(session_dir, 0o777)
-    
-    logger.info(f"Created persistent upload directory: {session_dir}")
-    return session_dir
+# Keep open campaigns pulled and merged in the background (only when enabled and CRM is configured)
+if WARM_INTERVAL_SECONDS > 0:
+    if crm_configured():
+        schedule_manager.add_warm_cache_job(warm_open_campaigns, WARM_INTERVAL_SECONDS)
+    else:
+        logger.info("Dynamics CRM is not configured, not scheduling the warm-cache job")
 
-def cleanup_upload_folder(folder_path):
-    """Clean up the upload folder."""
-    try:
-        if os.path.exists(folder_path):
-            logger.debug(f"Cleaning up upload folder: {folder_path}")
-            shutil.rmtree(folder_path, ignore_errors=True)
-    except Exception as e:
-        logger.error(f"Error cleaning up upload folder: {str(e)}")
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
-# Create upload folder with proper permissions
-app.config['UPLOAD_FOLDER'] = create_persistent_temp_dir()
+# Parent of the per-request working directories
+WORKSPACE_ROOT = os.path.join(tempfile.gettempdir(), 'convention_badges_workspaces')
 
-# Register cleanup function to run when the server shuts down
-atexit.register(cleanup_upload_folder, app.config['UPLOAD_FOLDER'])
+def request_workspace():
+    """
+    Create a private working directory for one request.
+    
+    Use as a context manager; the directory and everything written to it
+    are removed when the block exits. Requests never share a directory or
+    change the process-wide working directory, so they can run concurrently.
+    """
+    os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+    return tempfile.TemporaryDirectory(dir=WORKSPACE_ROOT)
 
 # Configure badge generation directories
 app.config['BADGE_TEMPLATES_FOLDER'] = os.path.join(BASE_PATH, 'badge_templates')
@@ -818,7 +831,7 @@ def serve_badge_template(filename):
 def get_open_campaigns():
     """Get list of open campaigns from Dynamics CRM."""
     try:
-        crm_client = DynamicsCRMClient()
+        crm_client = get_crm_client()
         campaigns = crm_client.get_open_campaigns()
         
         logger.info(f"Retrieved {len(campaigns)} open campaigns")
@@ -833,7 +846,7 @@ def get_open_campaigns():
 def get_campaign_sub_events(campaign_id):
     """Get list of sub-events for a specific campaign from Dynamics CRM."""
     try:
-        crm_client = DynamicsCRMClient()
+        crm_client = get_crm_client()
         sub_events = crm_client.get_sub_events(campaign_id)
         
         logger.info(f"Retrieved {len(sub_events)} sub-events for campaign {campaign_id}")
@@ -842,6 +855,102 @@ def get_campaign_sub_events(campaign_id):
     except Exception as e:
         logger.error(f"Error fetching sub-events for campaign {campaign_id}: {str(e)}")
         return jsonify({'error': f'Failed to fetch sub-events: {str(e)}'}), 500
+
+@app.route('/api/campaigns/<campaign_id>/summary', methods=['GET'])
+@login_required
+def get_campaign_summary(campaign_id):
+    """Get server-side headcounts (per sub-event, status, club and form response) for a campaign."""
+    try:
+        crm_client = get_crm_client()
+        summary = crm_client.get_campaign_summary(campaign_id)
+        
+        logger.info(f"Retrieved summary for campaign {campaign_id}")
+        # Blank groups (e.g. contacts without a club) are returned as null
+        return jsonify({name: df.astype(object).where(df.notna(), None).to_dict(orient='records')
+                        for name, df in summary.items()})
+        
+    except Exception as e:
+        logger.error(f"Error fetching summary for campaign {campaign_id}: {str(e)}")
+        return jsonify({'error': f'Failed to fetch campaign summary: {str(e)}'}), 500
+
+@app.route('/api/crm/metrics', methods=['GET'])
+@login_required
+def crm_request_metrics():
+    """Get retry and throttling metrics for Dynamics CRM requests."""
+    return jsonify({'metrics': get_request_metrics()})
+
+# Names shown to staff for each CRM data type
+DATA_TYPE_DISPLAY_NAMES = {
+    'event_guests': 'Event Guests',
+    'qr_codes': 'QR Codes',
+    'table_reservations': 'Table Reservations',
+    'form_responses': 'Form Responses'
+}
+
+def get_campaign_frames(crm_client, campaign_id, force_refresh=False):
+    """
+    Get a campaign's CRM data as DataFrames keyed by FileTypes.
+    
+    Serves a recent background pull when there is one, otherwise pulls all 4
+    data types from CRM and caches the result.
+    
+    Args:
+        crm_client: DynamicsCRMClient used for the pull
+        campaign_id: GUID of the campaign
+        force_refresh: Always pull from CRM in full, ignoring the cached pull and the local replica
+    
+    Raises:
+        LookupError: If the campaign doesn't exist
+        DataPullError: If any data type fails to download
+    """
+    frames = None if force_refresh else campaign_cache.get_frames(campaign_id)
+    if frames is not None:
+        return frames
+    
+    data_types = list(DATA_TYPE_FILE_TYPES)
+    logger.info("Pulling Event Guests, QR Codes, Table Reservations and Form Responses from CRM...")
+    if BATCH_REQUESTS:
+        # Campaign lookup and all 4 queries in a single $batch round trip
+        batch = crm_client.download_campaign_batch(campaign_id, data_types, include_sub_events=False,
+                                                   force_refresh=force_refresh)
+        campaign_info = batch['campaign']
+        datasets = batch['datasets']
+    else:
+        campaign_info = crm_client.get_campaign_by_id(campaign_id)
+        datasets = None
+    
+    # Verify campaign exists
+    if not campaign_info:
+        raise LookupError(f"Campaign {campaign_id} not found")
+    logger.info(f"Using campaign: {campaign_info['name']} (ID: {campaign_id})")
+    
+    if datasets is None:
+        datasets = crm_client.download_all_data_filtered(campaign_id, data_types, force_refresh=force_refresh)
+    for data_type, df in datasets.items():
+        logger.info(f"Pulled {len(df)} records for {DATA_TYPE_DISPLAY_NAMES[data_type]}")
+    
+    # Hand the pulled DataFrames straight to the processor (no intermediate Excel files)
+    frames = build_frames(datasets)
+    campaign_cache.save_frames(campaign_id, frames, campaign_info['name'])
+    return frames
+
+def get_statistics_summary(crm_client, campaign_id):
+    """
+    Get server-side headcounts for the statistics report, if statistics are generated.
+    
+    Returns:
+        DynamicsCRMClient.get_campaign_summary() output, or None when
+        statistics are off or the aggregate queries fail (the report then
+        falls back to counting the merged rows)
+    """
+    if not event_statistics.GENERATE_STATISTICS:
+        return None
+    try:
+        return crm_client.get_campaign_summary(campaign_id)
+    except Exception as e:
+        logger.warning(f"Could not fetch campaign summary for statistics: {str(e)}")
+        return None
+
 @app.route('/api/badges/pull-and-process', methods=['POST'])
 @login_required
 def badges_pull_and_process():
@@ -861,6 +970,7 @@ def badges_pull_and_process():
         inclusion_list = data.get('inclusionList')
         created_on_filter = data.get('createdOnFilter')
         preprocessing_template_id = data.get('preprocessingTemplateId')
+        force_refresh = bool(data.get('forceRefresh'))
         
         if not campaign_id and not campaign_name:
             logger.error("No campaign ID or name provided")
@@ -870,7 +980,7 @@ def badges_pull_and_process():
         
         # Initialize CRM client
         try:
-            crm_client = DynamicsCRMClient()
+            crm_client = get_crm_client()
         except Exception as e:
             logger.error(f"Failed to initialize CRM client: {str(e)}")
             return jsonify({'error': f'Failed to connect to Dynamics CRM: {str(e)}'}), 500
@@ -886,77 +996,17 @@ def badges_pull_and_process():
             campaign_id = campaign_info['id']
             logger.info(f"Found campaign: {campaign_info['name']} (ID: {campaign_id})")
         
-        # Verify campaign exists
-        campaign_info = crm_client.get_campaign_by_id(campaign_id)
-        if not campaign_info:
+        # Serve a recent background pull if there is one, otherwise pull all 4 data types from CRM
+        try:
+            frames = get_campaign_frames(crm_client, campaign_id, force_refresh)
+        except LookupError:
             return jsonify({'error': 'Campaign not found'}), 404
+        except DataPullError as e:
+            failed = ', '.join(DATA_TYPE_DISPLAY_NAMES[data_type] for data_type in e.failures)
+            logger.error(f"Error pulling {failed}: {str(e)}")
+            return jsonify({'error': f'Failed to pull {failed}: {str(e)}'}), 500
         
-        logger.info(f"Using campaign: {campaign_info['name']} (ID: {campaign_id})")
-        
-        # Create temporary directory for processing
-        upload_folder = app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, mode=0o777, exist_ok=True)
-        
-        # Map data types to file types
-        data_type_mapping = {
-            'event_guests': {
-                'file_type': FileTypes.REGISTRATION,
-                'display_name': 'Event Guests'
-            },
-            'qr_codes': {
-                'file_type': FileTypes.QR_CODES,
-                'display_name': 'QR Codes'
-            },
-            'table_reservations': {
-                'file_type': FileTypes.SEATING,
-                'display_name': 'Table Reservations'
-            },
-            'form_responses': {
-                'file_type': FileTypes.FORM_RESPONSES,
-                'display_name': 'Form Responses'
-            }
-        }
-        
-        # Pull all 4 data types from CRM
-        for data_type, info in data_type_mapping.items():
-            try:
-                logger.info(f"Pulling {info['display_name']} from CRM...")
-                
-                # Use campaign-based filtering (main + sub-events)
-                df = crm_client.download_data_by_type_filtered(data_type, None, campaign_id)
-                
-                logger.info(f"Pulled {len(df)} records for {info['display_name']}")
-                
-                # Remove existing file of the same type
-                existing_files = [f for f in os.listdir(upload_folder) 
-                                if f.startswith(f"{info['file_type']}_")]
-                for existing_file in existing_files:
-                    try:
-                        existing_path = os.path.join(upload_folder, existing_file)
-                        if os.path.exists(existing_path):
-                            os.remove(existing_path)
-                            logger.debug(f"Removed existing file: {existing_file}")
-                    except Exception as e:
-                        logger.warning(f"Could not remove existing file {existing_file}: {e}")
-                
-                # Additional cleanup for seating data to prevent type issues
-                if data_type == 'table_reservations' and 'Event' in df.columns:
-                    import numpy as np
-                    # Ensure Event column is fully string type before saving
-                    df['Event'] = df['Event'].replace({np.nan: '', None: ''})
-                    df['Event'] = df['Event'].astype(str).replace('nan', '').replace('None', '')
-                    logger.debug(f"Cleaned Event column in seating data. Types: {df['Event'].apply(type).unique()}")
-                
-                # Save to Excel file with proper naming
-                temp_file = os.path.join(upload_folder, f"{info['file_type']}_crm_data.xlsx")
-                df.to_excel(temp_file, index=False)
-                logger.debug(f"Saved {info['display_name']} data to: {temp_file}")
-                
-            except Exception as e:
-                logger.error(f"Error pulling {info['display_name']}: {str(e)}")
-                return jsonify({'error': f'Failed to pull {info["display_name"]}: {str(e)}'}), 500
-        
-        # Now process the files using existing logic
+        # Now process the data using existing logic
         logger.info("All data pulled successfully, starting processing...")
         
         if not event_name:
@@ -964,50 +1014,11 @@ def badges_pull_and_process():
             return jsonify({'error': 'Event name is required'}), 400
         
         # Get the preprocessing implementation from database templates
-        preprocessor_class = None
-        
-        # Check if user selected a database template
-        if preprocessing_template_id:
-            try:
-                from utils.magazine.scheduler import PreprocessingTemplate
-                template = PreprocessingTemplate.query.get(int(preprocessing_template_id))
-                if template:
-                    logger.info(f"Using database preprocessing template: {template.name}")
-                    # Create a dynamic preprocessor class from the database template
-                    preprocessor_class = create_preprocessor_from_template(template)
-                else:
-                    logger.warning(f"Preprocessing template {preprocessing_template_id} not found, using default")
-            except Exception as e:
-                logger.error(f"Error loading preprocessing template: {str(e)}")
-        
-        # Use default preprocessing (no custom mappings) if no template selected
-        if not preprocessor_class:
-            logger.info("No preprocessing template selected, using default (no custom transformations)")
-            preprocessor_class = DefaultPreprocessing
+        preprocessor_class = resolve_preprocessor_class(preprocessing_template_id)
         
-        # Create temporary directory for processing
-        with tempfile.TemporaryDirectory() as temp_dir:
-            logger.debug(f"Created temporary directory: {temp_dir}")
-            os.makedirs(temp_dir, mode=0o777, exist_ok=True)
-            
-            # Copy uploaded files to temp directory
-            files = {}
-            for file_type in FileValidator.get_required_file_types():
-                matching_files = [f for f in os.listdir(upload_folder) 
-                                if f.startswith(f"{file_type}_")]
-                if not matching_files:
-                    logger.error(f"Missing required file: {file_type}")
-                    return jsonify({'error': f'Missing required file: {file_type}'}), 400
-                source = os.path.join(upload_folder, matching_files[0])
-                dest = os.path.join(temp_dir, os.path.basename(matching_files[0]))
-                logger.debug(f"Copying {file_type} file from {source} to {dest}")
-                shutil.copy2(source, dest)
-                files[file_type] = dest
-            
-            # Change to temp directory
-            original_dir = os.getcwd()
-            os.chdir(temp_dir)
-            logger.debug(f"Changed working directory to: {temp_dir}")
+        # Private working directory for this request's files
+        with request_workspace() as workspace:
+            logger.debug(f"Created request workspace: {workspace}")
             
             try:
                 # Create preprocessing config
@@ -1022,17 +1033,20 @@ def badges_pull_and_process():
                 # Initialize processor
                 processor = EventRegistrationProcessorV3(
                     config=config_obj,
-                    preprocessor_class=preprocessor_class
+                    preprocessor_class=preprocessor_class,
+                    input_dir=workspace,
+                    campaign_summary=get_statistics_summary(crm_client, campaign_id)
                 )
                 
-                # Process files
-                logger.info("Starting file processing...")
-                result_df = processor.transform_and_merge()
+                # Process the pulled data
+                logger.info("Starting data processing...")
+                result_df = processor.transform_and_merge(frames, merge_state=campaign_cache.get_merge_state(campaign_id))
+                campaign_cache.save_merge_state(campaign_id, processor.merge_state)
                 logger.debug(f"Processing complete. Result shape: {result_df.shape}")
                 
                 # Save output
-                output_file = os.path.join(temp_dir, "MAIL_MERGE_output.xlsx")
-                result_df.to_excel(output_file, index=False)
+                output_file = os.path.join(workspace, "MAIL_MERGE_output.xlsx")
+                write_excel(result_df, output_file)
                 logger.debug(f"Saved output to: {output_file}")
                 
                 # Send file to user
@@ -1046,13 +1060,99 @@ def badges_pull_and_process():
             except Exception as e:
                 logger.exception("Error during processing")
                 return jsonify({'error': f'Processing error: {str(e)}\n{traceback.format_exc()}'}), 500
-            
-            finally:
-                os.chdir(original_dir)
-                logger.debug(f"Changed working directory back to: {original_dir}")
     except Exception as e:
         logger.exception("Error in badges_v2_pull_and_process handler")
         return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/badges/pull-and-process-sub-events', methods=['POST'])
+@login_required
+def badges_pull_and_process_sub_events():
+    """Pull and merge a campaign once, then return one mail merge file per sub-event as a zip."""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'No data received'}), 400
+        
+        campaign_id = data.get('campaign_id')
+        campaign_name = data.get('campaign_name')
+        event_name = data.get('event')
+        sub_events = data.get('subEvents') or []
+        inclusion_list = data.get('inclusionList')
+        created_on_filter = data.get('createdOnFilter')
+        preprocessing_template_id = data.get('preprocessingTemplateId')
+        force_refresh = bool(data.get('forceRefresh'))
+        
+        if not campaign_id and not campaign_name:
+            return jsonify({'error': 'Campaign ID or name is required'}), 400
+        if not event_name:
+            return jsonify({'error': 'Event name is required'}), 400
+        if not isinstance(sub_events, list) or not sub_events:
+            return jsonify({'error': 'subEvents must be a non-empty list'}), 400
+        
+        try:
+            crm_client = get_crm_client()
+        except Exception as e:
+            logger.error(f"Failed to initialize CRM client: {str(e)}")
+            return jsonify({'error': f'Failed to connect to Dynamics CRM: {str(e)}'}), 500
+        
+        # Get campaign ID if only name was provided
+        if campaign_name and not campaign_id:
+            campaign_info = crm_client.get_campaign_by_name(campaign_name)
+            if not campaign_info:
+                return jsonify({'error': f'Campaign "{campaign_name}" not found'}), 404
+            campaign_id = campaign_info['id']
+        
+        try:
+            frames = get_campaign_frames(crm_client, campaign_id, force_refresh)
+        except LookupError:
+            return jsonify({'error': 'Campaign not found'}), 404
+        except DataPullError as e:
+            failed = ', '.join(DATA_TYPE_DISPLAY_NAMES[data_type] for data_type in e.failures)
+            logger.error(f"Error pulling {failed}: {str(e)}")
+            return jsonify({'error': f'Failed to pull {failed}: {str(e)}'}), 500
+        
+        # Private working directory for this request's files
+        with request_workspace() as workspace:
+            logger.debug(f"Created request workspace: {workspace}")
+            
+            config_obj = PreprocessingConfig(
+                main_event=event_name,
+                inclusion_list=inclusion_list if inclusion_list else None,
+                created_on_filter=created_on_filter if created_on_filter else None
+            )
+            processor = EventRegistrationProcessorV3(
+                config=config_obj,
+                preprocessor_class=resolve_preprocessor_class(preprocessing_template_id),
+                input_dir=workspace,
+                campaign_summary=get_statistics_summary(crm_client, campaign_id)
+            )
+            
+            # One merge shared by every sub-event
+            logger.info(f"Processing {len(sub_events)} sub-events from one merge...")
+            outputs = processor.transform_and_merge_sub_events(
+                sub_events, frames, merge_state=campaign_cache.get_merge_state(campaign_id))
+            campaign_cache.save_merge_state(campaign_id, processor.merge_state)
+            
+            archive_path = os.path.join(workspace, "MAIL_MERGE_sub_events.zip")
+            with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+                for sub_event, result_df in outputs.items():
+                    clean_name = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in (sub_event or 'all'))
+                    output_name = f"MAIL_MERGE_{event_name.replace(' ', '_')}_{clean_name}.xlsx"
+                    output_file = os.path.join(workspace, output_name)
+                    write_excel(result_df, output_file)
+                    zf.write(output_file, output_name)
+                    logger.info(f"Added {len(result_df)} contacts for {sub_event or 'all'}")
+            
+            return send_file(
+                archive_path,
+                as_attachment=True,
+                download_name=f"MAIL_MERGE_{event_name.replace(' ', '_')}_sub_events.zip",
+                mimetype='application/zip'
+            )
+    
+    except Exception as e:
+        logger.exception("Error in badges_pull_and_process_sub_events handler")
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
 # ============================================================================
 # Badge Generation API Endpoints
 # ============================================================================
@@ -1580,18 +1680,19 @@ def generate_badges():
         )
         
         # Generate PDF
-        output_pdf = os.path.join(tempfile.gettempdir(), f'badges_{int(datetime.utcnow().timestamp())}.pdf')
-        generator.generate_pdf(output_pdf)
-        
-        logger.info(f"Generated badges PDF: {output_pdf}")
-        
-        # Send file
-        return send_file(
-            output_pdf,
-            as_attachment=True,
-            download_name='badges.pdf',
-            mimetype='application/pdf'
-        )
+        with request_workspace() as workspace:
+            output_pdf = os.path.join(workspace, 'badges.pdf')
+            generator.generate_pdf(output_pdf)
+            
+            logger.info(f"Generated badges PDF: {output_pdf}")
+            
+            # Send file
+            return send_file(
+                output_pdf,
+                as_attachment=True,
+                download_name='badges.pdf',
+                mimetype='application/pdf'
+            )
         
     except Exception as e:
         logger.exception("Error generating badges")
@@ -1613,12 +1714,13 @@ def badges_pull_process_generate():
         inclusion_list = data.get('inclusionList')
         created_on_filter = data.get('createdOnFilter')
         preprocessing_template_id = data.get('preprocessingTemplateId')
+        force_refresh = bool(data.get('forceRefresh'))
         
         if not campaign_id and not campaign_name:
             return jsonify({'error': 'Campaign ID or name is required'}), 400
         
         # Initialize CRM client
-        crm_client = DynamicsCRMClient()
+        crm_client = get_crm_client()
         
         # Get campaign ID if only name provided
         if campaign_name and not campaign_id:
@@ -1627,44 +1729,23 @@ def badges_pull_process_generate():
                 return jsonify({'error': f'Campaign {campaign_name} not found'}), 404
             campaign_id = campaign_info['id']
         
-        # Pull and process data
-        upload_folder = app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, mode=0o777, exist_ok=True)
-        
-        # Pull all 4 data types
-        data_type_mapping = {
-            'event_guests': FileTypes.REGISTRATION,
-            'qr_codes': FileTypes.QR_CODES,
-            'table_reservations': FileTypes.SEATING,
-            'form_responses': FileTypes.FORM_RESPONSES
-        }
+        # Serve a recent background pull if there is one, otherwise pull all 4 data types from CRM
+        try:
+            frames = get_campaign_frames(crm_client, campaign_id, force_refresh)
+        except LookupError:
+            return jsonify({'error': 'Campaign not found'}), 404
+        except DataPullError as e:
+            failed = ', '.join(DATA_TYPE_DISPLAY_NAMES[data_type] for data_type in e.failures)
+            logger.error(f"Error pulling {failed}: {str(e)}")
+            return jsonify({'error': f'Failed to pull {failed}: {str(e)}'}), 500
         
-        for data_type, file_type in data_type_mapping.items():
-            df = crm_client.download_data_by_type_filtered(data_type, None, campaign_id)
-            temp_file = os.path.join(upload_folder, f"{file_type}_crm_data.xlsx")
-            df.to_excel(temp_file, index=False)
+        # Name the download after the campaign even when only its ID was given
+        if not campaign_name:
+            campaign_info = crm_client.get_campaign_by_id(campaign_id)
+            campaign_name = campaign_info['name'] if campaign_info else campaign_id
         
         # Get the preprocessing implementation from database templates
-        preprocessor_class = None
-        
-        # Check if user selected a database template
-        if preprocessing_template_id:
-            try:
-                from utils.magazine.scheduler import PreprocessingTemplate
-                template = PreprocessingTemplate.query.get(int(preprocessing_template_id))
-                if template:
-                    logger.info(f"Using database preprocessing template: {template.name}")
-                    # Create a dynamic preprocessor class from the database template
-                    preprocessor_class = create_preprocessor_from_template(template)
-                else:
-                    logger.warning(f"Preprocessing template {preprocessing_template_id} not found, using default")
-            except Exception as e:
-                logger.error(f"Error loading preprocessing template: {str(e)}")
-        
-        # Use default preprocessing (no custom mappings) if no template selected
-        if not preprocessor_class:
-            logger.info("No preprocessing template selected, using default (no custom transformations)")
-            preprocessor_class = DefaultPreprocessing
+        preprocessor_class = resolve_preprocessor_class(preprocessing_template_id)
         
         config_obj = PreprocessingConfig(
             main_event=event_name,
@@ -1673,80 +1754,67 @@ def badges_pull_process_generate():
             created_on_filter=created_on_filter
         )
         
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Copy files to temp directory
-            for file_type in FileValidator.get_required_file_types():
-                matching_files = [f for f in os.listdir(upload_folder) if f.startswith(f"{file_type}_")]
-                if matching_files:
-                    source = os.path.join(upload_folder, matching_files[0])
-                    dest = os.path.join(temp_dir, os.path.basename(matching_files[0]))
-                    shutil.copy2(source, dest)
+        with request_workspace() as workspace:
+            processor = EventRegistrationProcessorV3(config=config_obj, preprocessor_class=preprocessor_class,
+                                                     input_dir=workspace,
+                                                     campaign_summary=get_statistics_summary(crm_client, campaign_id))
+            result_df = processor.transform_and_merge(frames, merge_state=campaign_cache.get_merge_state(campaign_id))
+            campaign_cache.save_merge_state(campaign_id, processor.merge_state)
             
-            original_dir = os.getcwd()
-            os.chdir(temp_dir)
-            
-            try:
-                processor = EventRegistrationProcessorV3(config=config_obj, preprocessor_class=preprocessor_class)
-                result_df = processor.transform_and_merge()
+            # Now generate badges if template specified
+            template_id = data.get('template_id')
+            if template_id:
+                template = BadgeTemplate.query.get(template_id)
+                if not template:
+                    return jsonify({'error': 'Badge template not found'}), 404
                 
-                # Save processed Excel file
-                processed_excel = os.path.join(temp_dir, 'processed_data.xlsx')
-                result_df.to_excel(processed_excel, index=False)
+                svg_path = os.path.join(app.config['BADGE_TEMPLATES_FOLDER'], template.svg_filename)
                 
-                # Now generate badges if template specified
-                template_id = data.get('template_id')
-                if template_id:
-                    template = BadgeTemplate.query.get(template_id)
-                    if not template:
-                        return jsonify({'error': 'Badge template not found'}), 404
-                    
-                    svg_path = os.path.join(app.config['BADGE_TEMPLATES_FOLDER'], template.svg_filename)
-                    
-                    # Get club logo path from template (optional)
-                    club_logo_path = None
-                    if template.club_logo_filename:
-                        club_logo_path = os.path.join(app.config['BADGE_LOGOS_FOLDER'], template.club_logo_filename)
-                        if not os.path.exists(club_logo_path):
-                            logger.warning(f"Club logo not found: {club_logo_path}")
-                            club_logo_path = None
-                        else:
-                            logger.info(f"Using club logo: {club_logo_path}")
-                    
-                    avery_template = template.avery_template
-                    column_mappings = json.loads(template.column_mappings)
-                    
-                    generator = BadgeGenerator(
-                        excel_file=processed_excel,
-                        svg_template_path=svg_path,
-                        column_mappings=column_mappings,
-                        afrp_logo_path=app.config['AFRP_LOGO_PATH'],
-                        club_logo_path=club_logo_path,
-                        club_logo_width=template.club_logo_width,
-                        club_logo_height=template.club_logo_height,
-                        avery_template=avery_template,
-                        show_outlines=template.show_outlines
-                    )
-                    
-                    output_pdf = os.path.join(tempfile.gettempdir(), f'badges_{int(datetime.utcnow().timestamp())}.pdf')
-                    generator.generate_pdf(output_pdf)
-                    
-                    return send_file(
-                        output_pdf,
-                        as_attachment=True,
-                        download_name=f'badges_{campaign_name.replace(" ", "_")}.pdf',
-                        mimetype='application/pdf'
-                    )
-                else:
-                    # If no template specified, just return the processed Excel
-                    return send_file(
-                        processed_excel,
-                        as_attachment=True,
-                        download_name=f'MAIL_MERGE_{campaign_name.replace(" ", "_")}.xlsx',
-                        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                    )
-                    
-            finally:
-                os.chdir(original_dir)
+                # Get club logo path from template (optional)
+                club_logo_path = None
+                if template.club_logo_filename:
+                    club_logo_path = os.path.join(app.config['BADGE_LOGOS_FOLDER'], template.club_logo_filename)
+                    if not os.path.exists(club_logo_path):
+                        logger.warning(f"Club logo not found: {club_logo_path}")
+                        club_logo_path = None
+                    else:
+                        logger.info(f"Using club logo: {club_logo_path}")
+                
+                avery_template = template.avery_template
+                column_mappings = json.loads(template.column_mappings)
+                
+                generator = BadgeGenerator(
+                    excel_file=None,
+                    svg_template_path=svg_path,
+                    column_mappings=column_mappings,
+                    afrp_logo_path=app.config['AFRP_LOGO_PATH'],
+                    club_logo_path=club_logo_path,
+                    club_logo_width=template.club_logo_width,
+                    club_logo_height=template.club_logo_height,
+                    avery_template=avery_template,
+                    show_outlines=template.show_outlines,
+                    data=result_df
+                )
+                
+                output_pdf = os.path.join(workspace, 'badges.pdf')
+                generator.generate_pdf(output_pdf)
+                
+                return send_file(
+                    output_pdf,
+                    as_attachment=True,
+                    download_name=f'badges_{campaign_name.replace(" ", "_")}.pdf',
+                    mimetype='application/pdf'
+                )
+            else:
+                # If no template specified, just return the processed Excel
+                processed_excel = os.path.join(workspace, 'processed_data.xlsx')
+                write_excel(result_df, processed_excel)
+                return send_file(
+                    processed_excel,
+                    as_attachment=True,
+                    download_name=f'MAIL_MERGE_{campaign_name.replace(" ", "_")}.xlsx',
+                    mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                )
                 
     except Exception as e:
         logger.exception("Error in combined pull-process-generate")
@@ -26,5 +26,7 @@ echo "Starting application server..."
 echo "=========================================="
 
 # Start the application with gunicorn
-# The scheduler will be initialized by the app
-exec gunicorn --bind 0.0.0.0:5066 --workers 1 --threads 2 app:app
+# The scheduler will be initialized by the app, so keep a single worker
+# (each worker would run its own scheduler); requests use private workspaces
+# and are safe to handle on concurrent threads
+exec gunicorn --bind 0.0.0.0:5066 --workers 1 --threads "${GUNICORN_THREADS:-8}" app:app
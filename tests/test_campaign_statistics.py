@@ -0,0 +1,71 @@
+"""Statistics report built from FetchXML campaign headcounts."""
+
+import pandas as pd
+import pytest
+
+import utils.badges.event_statistics as event_statistics
+from utils.badges.event_statistics import EventStatisticsReport
+from utils.dynamics_crm import DynamicsCRMClient
+
+CLUBS = pd.DataFrame({
+    'Event': ['Gala', 'Gala', 'Gala', 'Brunch'],
+    'Status': ['Paid', 'Paid', 'Cancelled', 'Paid'],
+    'Local Club': ['Boston', 'Detroit', 'Boston', None],
+    'Count': [5, 3, 2, 4],
+})
+
+FORM_RESPONSES = pd.DataFrame({
+    'Event': ['Gala', 'Gala', 'Brunch'],
+    'Question': ['Meal', 'Meal', 'Shirt'],
+    'Response': ['Fish', 'Beef', 'L'],
+    'Count': [6, 2, 4],
+})
+
+
+@pytest.fixture
+def summary(monkeypatch):
+    client = DynamicsCRMClient.__new__(DynamicsCRMClient)
+    requested = []
+
+    def registration_counts(campaign_id, by_club=False):
+        requested.append('clubs' if by_club else 'registrations')
+        return CLUBS.copy()
+
+    def form_response_counts(campaign_id):
+        requested.append('form_responses')
+        return FORM_RESPONSES.copy()
+
+    monkeypatch.setattr(client, 'get_registration_counts', registration_counts)
+    monkeypatch.setattr(client, 'get_form_response_counts', form_response_counts)
+    result = client.get_campaign_summary('campaign')
+    assert requested == ['clubs', 'form_responses']
+    return result
+
+
+@pytest.fixture
+def report(tmp_path, monkeypatch):
+    monkeypatch.setattr(event_statistics, 'GENERATE_STATISTICS', True)
+    return EventStatisticsReport(str(tmp_path / 'reports'))
+
+
+def test_registration_totals_derived_from_club_counts(summary):
+    totals = summary['registrations'].set_index(['Event', 'Status'])['Count'].to_dict()
+    assert totals == {('Gala', 'Paid'): 8, ('Gala', 'Cancelled'): 2, ('Brunch', 'Paid'): 4}
+
+
+def test_report_built_from_summary(summary, report):
+    report.collect_summary_statistics(summary)
+
+    assert report.event_stats['Gala'] == {
+        'total': 10, 'yes': 8, 'no': 2, 'club_breakdown': {'Boston': 5, 'Detroit': 3},
+    }
+    assert report.event_stats['Brunch']['yes'] == 4
+    assert report.form_responses['Gala ~ Meal'] == {'responses': {'Beef': 2, 'Fish': 6}}
+    assert report.generate_report() is not None
+
+
+def test_report_limited_to_sub_event(summary, report):
+    report.collect_summary_statistics(summary, event='Brunch')
+
+    assert list(report.event_stats) == ['Brunch']
+    assert list(report.form_responses) == ['Brunch ~ Shirt']
@@ -0,0 +1,113 @@
+"""Shared change-tracking delta links fanned out to replicated campaigns."""
+
+import re
+import threading
+import urllib.parse
+
+import pandas as pd
+import pytest
+import requests
+
+import utils.dynamics_crm as dynamics_crm
+from utils.crm_replica import CRMReplica
+from utils.dynamics_crm import DynamicsCRMClient
+
+ENTITY_SET = 'crca7_eventguests'
+
+
+class FakeDataverse(DynamicsCRMClient):
+    """Event Guests held in memory as record ID -> campaign ID, with a change feed."""
+
+    def __init__(self, db_path):
+        self.replica = CRMReplica(str(db_path))
+        self._tracking_lock = threading.Lock()
+        self.guests = {'g1': 'A', 'g2': 'A', 'g3': 'B', 'g4': 'C'}
+        self.feed = []
+        self.expired = False
+
+    def change(self, record_id, campaign_id):
+        self.guests[record_id] = campaign_id
+        self.feed.append((record_id, False))
+
+    def delete(self, record_id):
+        del self.guests[record_id]
+        self.feed.append((record_id, True))
+
+    def _iter_pages(self, endpoint, page_size=None, first_page=None, stream=False, track_changes=False):
+        if endpoint.startswith('delta:'):
+            if self.expired:
+                raise requests.exceptions.HTTPError('410 Gone')
+            seen = int(endpoint.split(':')[1])
+            yield {
+                'value': [{'@odata.context': '$metadata#crca7_eventguests/$deletedEntity', 'id': record_id}
+                          if deleted else {'crca7_eventguestid': record_id}
+                          for record_id, deleted in self.feed[seen:]],
+                '@odata.deltaLink': f'delta:{len(self.feed)}',
+            }
+            return
+        query = urllib.parse.unquote(endpoint)
+        if 'PropertyValues' in query:
+            # Membership lookup of changed records
+            ids = re.findall(r"'([^']+)'", query.split('PropertyValues')[1])
+            yield {'value': [{'crca7_eventguestid': record_id,
+                              'crca7_Event': {'campaignid': self.guests[record_id].lower(),
+                                              '_aha_parentcampaign_value': None}}
+                             for record_id in ids if record_id in self.guests]}
+            return
+        # Start of change tracking
+        yield {'value': [], '@odata.deltaLink': f'delta:{len(self.feed)}'}
+
+    def _campaign_endpoint(self, data_type, campaign_id, modified_since=None, record_ids=None):
+        return f'{campaign_id}|{",".join(record_ids or [])}'
+
+    def _campaign_dataframe(self, data_type, endpoint=None, first_page=None):
+        campaign_id, record_ids = endpoint.split('|')
+        wanted = set(record_ids.split(',')) if record_ids else None
+        ids = [record_id for record_id, campaign in self.guests.items()
+               if campaign == campaign_id and (wanted is None or record_id in wanted)]
+        return pd.DataFrame({'eventguestid': ids, 'campaign': [campaign_id] * len(ids)})
+
+
+@pytest.fixture
+def crm(tmp_path, monkeypatch):
+    monkeypatch.setattr(dynamics_crm, 'CHANGE_TRACKING', True)
+    return FakeDataverse(tmp_path / 'replica.db')
+
+
+def pull(crm, campaign_id):
+    return sorted(crm._sync_replica('event_guests', campaign_id)['eventguestid'])
+
+
+def test_one_delta_link_shared_by_campaigns(crm):
+    assert pull(crm, 'A') == ['g1', 'g2']
+    assert pull(crm, 'B') == ['g3']
+
+    assert crm.replica.get_tracking_link(ENTITY_SET) == 'delta:0'
+
+
+def test_changes_fan_out_to_affected_campaigns(crm):
+    pull(crm, 'A')
+    pull(crm, 'B')
+
+    crm.change('g1', 'B')   # moves from A to B
+    crm.delete('g3')
+    crm.change('g5', 'A')   # new in A
+    crm.change('g4', 'C')   # campaign C is not replicated
+
+    assert pull(crm, 'A') == ['g2', 'g5']
+    assert crm.replica.get_tracking_link(ENTITY_SET) == 'delta:4'
+    # B's changes were queued by A's poll and are applied on B's next pull
+    assert pull(crm, 'B') == ['g1']
+    assert crm.replica.get_pending('B', 'event_guests') == ([], [], 0)
+
+
+def test_rejected_delta_link_forces_full_pulls(crm):
+    pull(crm, 'A')
+    pull(crm, 'B')
+    crm.change('g2', 'B')
+    crm.expired = True
+
+    assert pull(crm, 'A') == ['g1']
+    assert crm.replica.get_full_sync('B', 'event_guests') is None
+    crm.expired = False
+    assert pull(crm, 'B') == ['g2', 'g3']
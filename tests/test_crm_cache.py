@@ -0,0 +1,109 @@
+"""Single-flight fetching in cache_with_ttl."""
+
+import threading
+import time
+
+import pytest
+
+from utils.crm_cache import cache_with_ttl
+
+
+def run_concurrently(target, count):
+    errors = []
+
+    def call():
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def test_missing_key_fetched_once():
+    calls = []
+
+    @cache_with_ttl(ttl_seconds=60)
+    def fetch(key):
+        calls.append(key)
+        time.sleep(0.05)
+        return key.upper()
+
+    assert run_concurrently(lambda: fetch('a'), 8) == []
+    assert calls == ['a']
+    assert fetch('a') == 'A'
+
+
+def test_caller_arriving_after_a_failure_waits_for_the_retry():
+    # A fails while B waits for the key; C arrives while B is fetching and must not fetch alongside it
+    active = 0
+    peak = 0
+    calls = 0
+    guard = threading.Lock()
+    release = [threading.Event(), threading.Event(), threading.Event()]
+    started = [threading.Event(), threading.Event(), threading.Event()]
+
+    @cache_with_ttl(ttl_seconds=60)
+    def fetch(key):
+        nonlocal active, peak, calls
+        with guard:
+            call = calls
+            calls += 1
+            active += 1
+            peak = max(peak, active)
+        started[call].set()
+        release[call].wait(2)
+        with guard:
+            active -= 1
+        if call == 0:
+            raise RuntimeError('CRM unavailable')
+        return key
+
+    results = []
+
+    def call():
+        try:
+            results.append(fetch('a'))
+        except RuntimeError as e:
+            results.append(e)
+
+    first = threading.Thread(target=call)
+    first.start()
+    assert started[0].wait(2)
+    second = threading.Thread(target=call)
+    second.start()
+    time.sleep(0.05)
+    release[0].set()
+    assert started[1].wait(2)
+    third = threading.Thread(target=call)
+    third.start()
+    time.sleep(0.05)
+    release[1].set()
+    release[2].set()
+    for thread in (first, second, third):
+        thread.join(2)
+
+    assert peak == 1
+    assert calls == 2
+    assert results[1:] == ['a', 'a']
+
+
+def test_failure_does_not_wedge_the_key():
+    attempts = []
+
+    @cache_with_ttl(ttl_seconds=60)
+    def fetch(key):
+        attempts.append(key)
+        if len(attempts) == 1:
+            raise RuntimeError('boom')
+        return key
+
+    with pytest.raises(RuntimeError):
+        fetch('a')
+    assert fetch('a') == 'a'
+    assert len(attempts) == 2
@@ -0,0 +1,104 @@
+"""Retry and back-off behaviour of DynamicsCRMClient._send."""
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+import requests
+
+import utils.dynamics_crm as dynamics_crm
+from utils.dynamics_crm import DynamicsCRMClient
+
+
+class FakeResponse(requests.Response):
+    def __init__(self, status_code, headers=None):
+        super().__init__()
+        self.status_code = status_code
+        self.headers.update(headers or {})
+        self._content = b''
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waited = []
+    monkeypatch.setattr(dynamics_crm.time, 'sleep', waited.append)
+    monkeypatch.setattr(dynamics_crm._request_bucket, 'acquire', lambda: 0.0)
+    monkeypatch.setattr(dynamics_crm._request_bucket, 'pause', lambda seconds: None)
+    return waited
+
+
+def make_client(responses):
+    client = DynamicsCRMClient.__new__(DynamicsCRMClient)
+    client.session = FakeSession(responses)
+    return client
+
+
+def test_retry_after_seconds_not_capped():
+    response = FakeResponse(429, {'Retry-After': '300'})
+    assert DynamicsCRMClient._retry_delay(response, 0) == 300
+
+
+def test_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=90)
+    response = FakeResponse(503, {'Retry-After': format_datetime(retry_at, usegmt=True)})
+    assert 85 <= DynamicsCRMClient._retry_delay(response, 0) <= 90
+
+
+def test_backoff_without_retry_after_is_capped():
+    for attempt in range(12):
+        delay = DynamicsCRMClient._retry_delay(None, attempt)
+        assert 0 <= delay <= min(dynamics_crm.RETRY_BACKOFF_MAX, dynamics_crm.RETRY_BACKOFF_BASE * 2 ** attempt)
+
+
+def test_send_retries_throttled_and_transient_failures(sleeps):
+    ok = FakeResponse(200)
+    client = make_client([
+        FakeResponse(429, {'Retry-After': '120'}),
+        requests.exceptions.ConnectionError('reset'),
+        ok,
+    ])
+
+    throttled = client.session.responses[0]
+    assert client._send('GET', 'https://crm/api', dict) is ok
+    assert client.session.calls == 3
+    assert sleeps[0] == 120
+    assert len(sleeps) == 2
+    # Retried responses release their connection; the returned one stays open
+    assert throttled.closed
+    assert not ok.closed
+
+
+def test_send_gives_up_after_max_retries(sleeps, monkeypatch):
+    monkeypatch.setattr(dynamics_crm, 'MAX_RETRIES', 2)
+    client = make_client([FakeResponse(503) for _ in range(3)])
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        client._send('GET', 'https://crm/api', dict)
+    assert client.session.calls == 3
+    assert len(sleeps) == 2
+
+
+def test_send_does_not_retry_client_errors(sleeps):
+    client = make_client([FakeResponse(404)])
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        client._send('GET', 'https://crm/api', dict)
+    assert client.session.calls == 1
+    assert sleeps == []
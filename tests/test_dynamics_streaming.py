@@ -0,0 +1,76 @@
+"""Incremental page parsing in DynamicsCRMClient._stream_page."""
+
+import json
+
+import pytest
+
+from utils.dynamics_crm import DynamicsCRMClient
+
+PAGE = {
+    "@odata.context": "https://crm/api/data/v9.2/$metadata#crca7_eventguests",
+    "value": [
+        {"crca7_eventguestid": "g1", "crca7_name": "Smith, Jo [VIP]", "statuscode": 1},
+        {"crca7_eventguestid": "g2", "crca7_name": "Say \"hi\", ok]}", "notes": "café ✓"},
+        {"crca7_eventguestid": "g3", "nested": {"value": [1, 2]}, "statuscode": None},
+    ],
+    "@odata.nextLink": "https://crm/api/data/v9.2/crca7_eventguests?$skiptoken=abc",
+}
+
+
+# The same records as column buffers (columns in order of first appearance)
+COLUMNS = {
+    key: [record.get(key) for record in PAGE["value"]]
+    for key in dict.fromkeys(key for record in PAGE["value"] for key in record)
+}
+
+
+class FakeStreamResponse:
+    def __init__(self, body, chunk_size):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.encoding = "utf-8"
+        self.closed = False
+
+    def iter_content(self, chunk_size=None, decode_unicode=False):
+        for start in range(0, len(self.body), self.chunk_size):
+            yield self.body[start:start + self.chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+def stream(body, chunk_size):
+    client = DynamicsCRMClient.__new__(DynamicsCRMClient)
+    response = FakeStreamResponse(body, chunk_size)
+    client._send = lambda *args, **kwargs: response
+    client._build_headers = lambda page_size=None: {}
+    return client._stream_page("https://crm/api/data/v9.2/crca7_eventguests"), response
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 16, 64, 100000])
+def test_stream_page_matches_plain_parse_at_any_chunk_boundary(chunk_size):
+    page, response = stream(json.dumps(PAGE, indent=1), chunk_size)
+
+    assert page["@odata.context"] == PAGE["@odata.context"]
+    assert page["@odata.nextLink"] == PAGE["@odata.nextLink"]
+    assert page["value"] == COLUMNS
+    assert response.closed
+
+
+def test_stream_page_backfills_columns_first_seen_later():
+    page, _ = stream(json.dumps(PAGE), 5)
+
+    assert page["value"]["notes"] == [None, "café ✓", None]
+    assert page["value"]["nested"] == [None, None, {"value": [1, 2]}]
+
+
+def test_stream_page_empty_collection():
+    page, _ = stream('{"@odata.context": "x", "value": []}', 4)
+
+    assert page == {"@odata.context": "x", "value": {}}
+
+
+def test_stream_page_truncated_body_raises():
+    body = json.dumps(PAGE)
+    with pytest.raises(ValueError):
+        stream(body[:body.index('"g3"')], 8)
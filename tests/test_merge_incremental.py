@@ -0,0 +1,133 @@
+"""Incremental merges must match a full rebuild of the same data."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.badges.convert_to_mail_merge_v3 import EventRegistrationProcessorV3
+from utils.badges.file_validator import FileTypes
+from utils.badges.pre_processing_module import PreprocessingConfig
+
+
+def campaign_frames():
+    rng = np.random.default_rng(0)
+    n = 120
+    contacts = [f'c{i % 50}' for i in range(n)]
+    registrations = pd.DataFrame({
+        'Contact ID': contacts,
+        'Member ID (Existing Contact) (Contact)': [f'ID-{c[1:]}' for c in contacts],
+        'First Name (Existing Contact) (Contact)': ['ann'] * n,
+        'Last Name (Existing Contact) (Contact)': [f'z{c}' for c in contacts],
+        'Title (Existing Contact) (Contact)': rng.choice(['Dr', None], n),
+        'Local Club (Existing Contact) (Contact)': rng.choice(['Boston', 'Detroit'], n),
+        'Gender (Existing Contact) (Contact)': rng.choice(['Male', 'Female', None], n),
+        'Age (Existing Contact) (Contact)': rng.integers(10, 80, n),
+        'Event': rng.choice(['Main', 'Gala', 'Brunch'], n),
+        'Status Reason': rng.choice(['Paid', 'Cancelled'], n, p=[.8, .2]),
+        'Created On': pd.date_range('2025-01-01', periods=n, freq='h').strftime('%Y-%m-%dT%H:%M:%SZ'),
+    })
+    seating = pd.DataFrame({
+        'Contact ID': [f'c{i}' for i in range(30)],
+        'Event': rng.choice(['Gala', 'Brunch'], 30),
+        'Table': rng.choice(['1', '2', None], 30),
+        'Created On': pd.date_range('2025-01-01', periods=30, freq='h').astype(str),
+    })
+    qr_codes = pd.DataFrame({
+        'Contact ID': [f'c{i % 45}' for i in range(50)],
+        'QR Code': [f'q{i}' for i in range(50)],
+        '(Do Not Modify) Modified On': pd.date_range('2025-01-01', periods=50, freq='h').astype(str),
+    })
+    form_responses = pd.DataFrame({
+        'Contact ID': [f'c{i % 40}' for i in range(60)],
+        'Campaign': rng.choice(['Gala', 'Brunch'], 60),
+        'Form Question': rng.choice(['Meal', 'Shirt'], 60),
+        'Guest Response': rng.choice(['Fish', 'Beef', 'L'], 60),
+        'Created On': pd.date_range('2025-01-01', periods=60, freq='h').astype(str),
+    })
+    return {
+        FileTypes.REGISTRATION: registrations,
+        FileTypes.SEATING: seating,
+        FileTypes.QR_CODES: qr_codes,
+        FileTypes.FORM_RESPONSES: form_responses,
+    }
+
+
+def change_qr_codes(frames):
+    qr_codes = frames[FileTypes.QR_CODES]
+    qr_codes.loc[2, 'QR Code'] = 'changed'
+    qr_codes.loc[len(qr_codes)] = ['c49', 'q-new', '2026-01-01 00:00:00']
+
+
+def change_registrations(frames):
+    registrations = frames[FileTypes.REGISTRATION]
+    registrations.loc[5, 'First Name (Existing Contact) (Contact)'] = 'bob'
+    registrations.loc[7, 'Status Reason'] = 'Cancelled'
+    added = registrations.loc[8].copy()
+    added['Contact ID'] = 'c-new'
+    added['Status Reason'] = 'Paid'
+    registrations.loc[len(registrations)] = added
+
+
+def change_seating(frames):
+    seating = frames[FileTypes.SEATING]
+    seating.loc[len(seating)] = ['c9', 'Dinner', '7', '2026-01-01 00:00:00']
+
+
+def campaign_frames_with(changes):
+    frames = campaign_frames()
+    for change in changes:
+        change(frames)
+    return frames
+
+
+def processor(sub_event=None):
+    return EventRegistrationProcessorV3(PreprocessingConfig(main_event='Main', sub_event=sub_event))
+
+
+def assert_same(incremental, full):
+    assert list(incremental.columns) == list(full.columns)
+    pd.testing.assert_frame_equal(incremental.reset_index(drop=True), full.reset_index(drop=True))
+
+
+@pytest.mark.parametrize('changes', [
+    [change_qr_codes],
+    [change_registrations],
+    [change_seating],
+    [change_registrations, change_qr_codes, change_seating],
+])
+@pytest.mark.parametrize('sub_event', [None, 'Gala'])
+def test_incremental_merge_matches_full_rebuild(changes, sub_event):
+    previous = processor()
+    previous.transform_and_merge(campaign_frames())
+
+    incremental = processor(sub_event)
+    result = incremental.transform_and_merge(campaign_frames_with(changes), merge_state=previous.merge_state)
+    full = processor(sub_event)
+    expected = full.transform_and_merge(campaign_frames_with(changes))
+
+    assert_same(incremental.merge_state.merged, full.merge_state.merged)
+    assert_same(result, expected)
+
+
+def test_only_changed_stages_are_rebuilt():
+    previous = processor()
+    previous.transform_and_merge(campaign_frames())
+
+    frames = campaign_frames()
+    change_qr_codes(frames)
+    current = processor()
+    current.transform_and_merge(frames, merge_state=previous.merge_state)
+
+    rebuilt = [file_type for file_type, stage in current.merge_state.stages.items()
+               if stage is not previous.merge_state.stages[file_type]]
+    assert rebuilt == [FileTypes.QR_CODES]
+
+
+def test_unchanged_data_reuses_the_merge():
+    previous = processor()
+    previous.transform_and_merge(campaign_frames())
+
+    current = processor()
+    current.transform_and_merge(campaign_frames(), merge_state=previous.merge_state)
+
+    assert current.merge_state.merged is previous.merge_state.merged
@@ -0,0 +1,57 @@
+"""Value preprocessing in PreprocessingBase.preprocess_dataframe."""
+
+import numpy as np
+import pandas as pd
+
+from utils.badges.pre_processing_module import PreprocessingBase
+
+
+class MappedPreprocessing(PreprocessingBase):
+    def get_value_mappings(self):
+        return {'Gala Dinner': 'Gala'}
+
+    def get_contains_mappings(self):
+        return {' (Paid)': ''}
+
+
+class CustomValuePreprocessing(MappedPreprocessing):
+    def preprocess_value(self, value, column_name=None):
+        if pd.isna(value):
+            return 'n/a'
+        if column_name == 'Local Club':
+            return str(value).upper()
+        return super().preprocess_value(value, column_name)
+
+
+def frame():
+    return pd.DataFrame({
+        'Contact ID': ['c1', 'c2', 'c3'],
+        'Local Club': ['Boston', None, 'Boston'],
+        'Gala Dinner': ['Gala Dinner', 'Gala Dinner (Paid)', np.nan],
+    })
+
+
+def test_mappings_applied_without_override():
+    result = MappedPreprocessing().preprocess_dataframe(frame())
+
+    assert result['Local Club'].tolist() == ['Boston', '', 'Boston']
+    assert result['Gala Dinner'].tolist() == ['Gala', 'Gala Dinner', '']
+
+
+def test_overridden_preprocess_value_is_used():
+    preprocessor = CustomValuePreprocessing()
+    df = frame()
+    result = preprocessor.preprocess_dataframe(df)
+
+    # Same as calling preprocess_value on every cell
+    for column in ['Local Club', 'Gala Dinner']:
+        expected = [preprocessor.preprocess_value(value, column) for value in df[column]]
+        assert result[column].tolist() == expected
+    assert result['Local Club'].tolist() == ['BOSTON', 'n/a', 'BOSTON']
+
+
+def test_overridden_preprocess_value_on_categoricals():
+    df = frame().astype({'Local Club': 'category'})
+    result = CustomValuePreprocessing().preprocess_dataframe(df)
+
+    assert result['Local Club'].astype(object).tolist() == ['BOSTON', 'n/a', 'BOSTON']
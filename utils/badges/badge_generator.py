@@ -77,18 +77,20 @@ class BadgeGenerator:
     
     def __init__(self, excel_file, svg_template_path, column_mappings, 
                  afrp_logo_path, club_logo_path=None, club_logo_width=None, 
-                 club_logo_height=None, avery_template='5392', show_outlines=False):
+                 club_logo_height=None, avery_template='5392', show_outlines=False,
+                 data=None):
         """
         Initialize the badge generator.
         
         Args:
-            excel_file: Path to processed Excel file
+            excel_file: Path to processed Excel file (ignored when data is given)
             svg_template_path: Path to SVG template file
             column_mappings: Dict mapping placeholders to Excel columns
             afrp_logo_path: Path to default AFRP logo
             club_logo_path: Optional path to club-specific logo
             avery_template: Avery template code (default: 5392)
             show_outlines: Draw badge outlines for alignment testing
+            data: Processed DataFrame to use directly instead of reading excel_file
         """
         self.excel_file = excel_file
         self.svg_template_path = svg_template_path
@@ -109,10 +111,15 @@ class BadgeGenerator:
         logger.info(f"  - SVG template: {svg_template_path}")
         logger.info(f"  - Show outlines: {show_outlines}")
         
-        # Load Excel data
-        logger.info(f"Loading Excel file: {excel_file}")
-        self.df = pd.read_excel(excel_file)
-        logger.info(f"Loaded {len(self.df)} rows from Excel")
+        if data is not None:
+            # Badge positions are derived from the row index, so it must be 0..n-1
+            self.df = data.reset_index(drop=True)
+            logger.info(f"Using {len(self.df)} rows from processed data")
+        else:
+            # Load Excel data
+            logger.info(f"Loading Excel file: {excel_file}")
+            self.df = pd.read_excel(excel_file)
+            logger.info(f"Loaded {len(self.df)} rows from Excel")
         
         # Validate template exists
         if avery_template not in self.AVERY_TEMPLATES:
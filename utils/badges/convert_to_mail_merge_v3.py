@@ -1,18 +1,20 @@
 import os
 import sys
 import pandas as pd
+import numpy as np
 import warnings
 import re
+import hashlib
+from dataclasses import dataclass, field
 from datetime import datetime
 import pytz
 import logging
 from typing import Dict, List, Tuple, Optional, Type
 from utils.badges.event_statistics import EventStatisticsReport
 from utils.badges.event_preprocessing.default import DefaultPreprocessing
-from utils.badges.pre_processing_module import PreprocessingConfig, PreprocessingBase
+from utils.badges.pre_processing_module import PreprocessingConfig, PreprocessingBase, transform_unique
 from utils.badges.file_validator import FileValidator, FileTypes
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
+from utils.badges.excel_export import write_excel
 
 
 # Configure logging
@@ -89,27 +91,68 @@ class FormResponseColumns:
         'Response': [RESPONSE, 'Guest Response', 'Response', 'Answer']
     }
 
+@dataclass
+class MergeStage:
+    """Output of one merge stage plus a fingerprint of the data set it was built from."""
+    fingerprint: Optional[str]
+    # Registration: the attendee rows. Other stages: their columns indexed by Contact ID
+    lookup: pd.DataFrame
+    # Value for attendees missing from the lookup, per column (NaN if not listed)
+    fill_values: Dict[str, object] = field(default_factory=dict)
+
+
+@dataclass
+class MergeState:
+    """Merged attendee table plus the stage outputs it was assembled from."""
+    merged: pd.DataFrame
+    stages: Dict[str, MergeStage]
+    # Latest registration Created On per Contact ID (any status), for the date filter
+    created_on: Optional[pd.Series] = None
+
+
+# Merge stages in the order their columns appear in the merged table
+MERGE_STAGES = [FileTypes.REGISTRATION, FileTypes.SEATING, FileTypes.FORM_RESPONSES, FileTypes.QR_CODES]
+
+# Contact columns of the merged table; every other column belongs to an event
+CONTACT_COLUMNS = ['Contact ID', 'Member ID', 'First Name', 'Last Name', 'Title', 'Local Club', 'Gender', 'Age']
+
+# Per-contact columns never stored as categoricals (nearly every value is distinct)
+IDENTITY_COLUMNS = ['Contact ID', 'Member ID', 'First Name', 'Last Name', 'QR Code']
+
+# Contact attributes shared by many attendees, always stored as categoricals
+# (as are all event, "{event} ~ Table" and "{event} ~ {question}" columns)
+CATEGORICAL_COLUMNS = ['Title', 'Local Club', 'Gender']
+
 class EventRegistrationProcessorV3:
-    def __init__(self, config: Optional[PreprocessingConfig] = None, preprocessor_class: Optional[Type[PreprocessingBase]] = None):
+    def __init__(self, config: Optional[PreprocessingConfig] = None, preprocessor_class: Optional[Type[PreprocessingBase]] = None,
+                 input_dir: str = '.', campaign_summary: Optional[Dict[str, pd.DataFrame]] = None):
         """
         Initialize the processor with optional configuration and preprocessor class.
         
         Args:
             config: Optional configuration for preprocessing
             preprocessor_class: Optional class to use for preprocessing. If not provided, defaults to DefaultPreprocessing
+            input_dir: Directory holding the input workbooks; output and reports are written here too
+            campaign_summary: Optional server-side counts (DynamicsCRMClient.get_campaign_summary)
+                              the statistics report is built from instead of the merged rows
         """
         self.config = config
+        self.input_dir = input_dir
         if preprocessor_class is None:
             logger.debug("No preprocessor class provided, defaulting to DefaultPreprocessing")
             preprocessor_class = DefaultPreprocessing
         
         logger.debug(f"Initializing preprocessor with class: {preprocessor_class.__name__}")
         self.preprocessor = preprocessor_class(config)
-        self.stats_reporter = EventStatisticsReport()
+        self.stats_reporter = EventStatisticsReport(os.path.join(input_dir, 'reports'))
+        self.campaign_summary = campaign_summary
+        self.merge_state: Optional[MergeState] = None
+        self.created_on: Optional[pd.Series] = None
         
     def find_latest_files(self) -> Dict[str, str]:
-        """Find the latest version of each file type in the directory."""
-        return FileValidator.find_latest_files()
+        """Find the latest version of each file type in the input directory, as paths."""
+        files = FileValidator.find_latest_files(self.input_dir)
+        return {file_type: os.path.join(self.input_dir, filename) for file_type, filename in files.items()}
 
     def _find_column_name(self, df: pd.DataFrame, column_mappings: Dict[str, List[str]], required_column: str) -> Optional[str]:
         """Find the actual column name in the DataFrame based on possible mappings."""
@@ -153,6 +196,14 @@ class EventRegistrationProcessorV3:
             logger.info(reg_df.columns.tolist())
             raise ValueError(f"Missing required columns in registration data: {', '.join(missing_columns)}")
         
+        # Keep each contact's latest registration date so the Created On filter needn't reload the data
+        try:
+            created_on = pd.to_datetime(reg_df['Created On'])
+            self.created_on = created_on.groupby(reg_df['Contact ID']).max()
+        except Exception as e:
+            logger.warning(f"Could not parse registration Created On: {str(e)}")
+            self.created_on = None
+        
         # Filter for paid registrations
         paid_df = reg_df[reg_df['Status'] == 'Paid']
         logger.info(f"\nFound {len(paid_df)} paid registrations out of {len(reg_df)} total")
@@ -165,15 +216,14 @@ class EventRegistrationProcessorV3:
             logger.info(f"  - {event}")
         
         # Create base DataFrame with unique contacts using only the key identifying columns
-        unique_columns = ['Contact ID', 'Member ID', 'First Name', 'Last Name', 'Title', 'Local Club', 'Gender', 'Age']
-        transformed_df = paid_df[unique_columns].drop_duplicates(subset=['Contact ID']).reset_index(drop=True)
+        transformed_df = paid_df[CONTACT_COLUMNS].drop_duplicates(subset=['Contact ID']).reset_index(drop=True)
         
         logger.info(f"\nFound {len(transformed_df)} unique contacts")
-
+        
         # Format names to proper case
         logger.info("Formatting names to proper case...")
-        transformed_df['First Name'] = transformed_df['First Name'].apply(lambda x: str(x).strip().title() if pd.notna(x) else x)
-        transformed_df['Last Name'] = transformed_df['Last Name'].apply(lambda x: str(x).strip().title() if pd.notna(x) else x)
+        transformed_df['First Name'] = transform_unique(transformed_df['First Name'], lambda x: str(x).strip().title())
+        transformed_df['Last Name'] = transform_unique(transformed_df['Last Name'], lambda x: str(x).strip().title())
         
         # Normalize Gender values - handle cases where formatted values didn't come through
         logger.info("Normalizing Gender values...")
@@ -200,28 +250,43 @@ class EventRegistrationProcessorV3:
                 logger.warning(f"Unknown gender value: '{value}', leaving blank")
                 return ''
         
-        transformed_df['Gender'] = transformed_df['Gender'].apply(normalize_gender)
+        transformed_df['Gender'] = transform_unique(transformed_df['Gender'], normalize_gender, na_value='Female')
         gender_counts = transformed_df['Gender'].value_counts().to_dict()
         logger.info(f"Gender distribution after normalization: {gender_counts}")
         
-        # Add each event as a new column
-        for event in unique_events:
-            # Use the same event name as the column name to maintain consistency
-            transformed_df[event] = transformed_df.apply(
-                lambda row: event if event in paid_df[
-                    paid_df['Contact ID'] == row['Contact ID']
-                ][event_col].values else None,
-                axis=1
-            )
-        
+        # Add each event as a new column holding the event name for registered contacts
+        if len(unique_events):
+            # One contact x event membership table instead of a scan of paid_df per contact
+            registered = (paid_df[['Contact ID', event_col]]
+                          .dropna()
+                          .drop_duplicates()
+                          .assign(registered=True)
+                          .pivot(index='Contact ID', columns=event_col, values='registered')
+                          .reindex(index=transformed_df['Contact ID'], columns=unique_events))
+            event_names = np.array(unique_events, dtype=object)
+            event_values = np.where(registered.notna().to_numpy(), event_names, None)
+            for i, event in enumerate(unique_events):
+                # Use the same event name as the column name to maintain consistency
+                transformed_df[event] = event_values[:, i]
+
         return transformed_df
 
     def add_seating_info(self, df: pd.DataFrame, seating_df: pd.DataFrame) -> pd.DataFrame:
         """Add seating information for each event."""
+        return self._join_columns(df, *self.seating_columns(seating_df))
+
+    def seating_columns(self, seating_df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, object]]:
+        """
+        Build the "{event} ~ Table" columns for every seated contact.
+        
+        Returns:
+            Table columns indexed by Contact ID, and the value ('') for
+            attendees without an assignment
+        """
         # Check if seating_df is empty - some events may not have seating assignments
         if seating_df.empty or len(seating_df) == 0:
             logger.info("No seating data found - skipping table assignment columns")
-            return df
+            return pd.DataFrame(), {}
         
         logger.debug("Seating file columns:")
         logger.debug(seating_df.columns.tolist())
@@ -235,7 +300,7 @@ class EventRegistrationProcessorV3:
             logger.warning("Missing required columns in seating data!")
             logger.warning(f"Missing columns: {missing_columns}")
             logger.warning("This event may not have seating assignments. Skipping table columns.")
-            return df
+            return pd.DataFrame(), {}
         
         # Group seating by Contact ID and Event, handling duplicates
         logger.info("Processing seating assignments...")
@@ -243,21 +308,29 @@ class EventRegistrationProcessorV3:
         
         logger.debug(f"Found {len(seating_info)} unique seating assignments")
         
-        # Get unique events and initialize table columns with empty strings
+        # Get unique events; their table columns default to empty strings
         # Filter out NaN/None values before sorting to avoid type comparison errors
         events_with_seating = sorted([e for e in seating_df['Event'].unique() if pd.notna(e) and str(e).strip() != ''])
-        logger.info("Initializing table columns...")
-        for event in events_with_seating:
-            column_name = f"{event} ~ Table"
-            df[column_name] = ''
+        fill_values = {f"{event} ~ Table": '' for event in events_with_seating}
             
         # Assign actual table values, skipping blanks/NaNs
         logger.info("Assigning tables to contacts...")
-        for _, row in seating_info.iterrows():
-            table_value = str(row['Table']).strip() if pd.notna(row['Table']) else ''
-            if table_value:
-                column_name = f"{row['Event']} ~ Table"
-                df.loc[df['Contact ID'] == row['Contact ID'], column_name] = table_value
+        tables = seating_info['Table'].astype(str).str.strip().where(seating_info['Table'].notna(), '')
+        assignments = pd.DataFrame({
+            'Contact ID': seating_info['Contact ID'],
+            'column': [f"{event} ~ Table" for event in seating_info['Event']],
+            'table': tables,
+        })
+        assignments = assignments[(assignments['table'] != '') & assignments['Contact ID'].notna()]
+        columns = list(fill_values) + [column for column in assignments['column'].unique() if column not in fill_values]
+        if assignments.empty:
+            grid = pd.DataFrame(columns=columns)
+        else:
+            # One Contact ID x table column grid
+            grid = (assignments
+                    .drop_duplicates(['Contact ID', 'column'], keep='last')
+                    .pivot(index='Contact ID', columns='column', values='table')
+                    .reindex(columns=columns))
 
         # Print unique events from seating chart for verification
         logger.info("Events found in seating chart:")
@@ -267,19 +340,27 @@ class EventRegistrationProcessorV3:
         # Print summary of table assignments
         logger.info("Table assignment summary:")
         for event in events_with_seating:
-            column_name = f"{event} ~ Table"
-            # Count non-empty strings for assignments
-            assigned = df[df[column_name] != ''].shape[0]
+            assigned = grid[f"{event} ~ Table"].notna().sum()
             logger.info(f"  - {event}: {assigned} assignments")
         
-        return df
+        return grid, fill_values
 
     def add_form_responses(self, df: pd.DataFrame, forms_df: pd.DataFrame) -> pd.DataFrame:
         """Add form responses for each event."""
+        return self._join_columns(df, *self.form_response_columns(forms_df))
+
+    def form_response_columns(self, forms_df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, object]]:
+        """
+        Build the "{event} ~ {question}" columns for every contact who responded.
+        
+        Returns:
+            Latest response per question indexed by Contact ID (attendees
+            without one get NaN), and an empty fill value mapping
+        """
         # Check if forms_df is empty - some events may not have form responses
         if forms_df.empty or len(forms_df) == 0:
             logger.info("No form responses data found - skipping form response columns")
-            return df
+            return pd.DataFrame(), {}
         
         logger.info("Form responses file columns BEFORE standardization:")
         logger.info(forms_df.columns.tolist())
@@ -292,7 +373,7 @@ class EventRegistrationProcessorV3:
             logger.warning("Available columns AFTER standardization:")
             logger.warning(forms_df.columns.tolist())
             logger.warning("\nThis event may not have form responses. Skipping form response columns.")
-            return df
+            return pd.DataFrame(), {}
         
         # Ensure Created On is properly parsed as datetime
         try:
@@ -302,57 +383,65 @@ class EventRegistrationProcessorV3:
             # If we can't parse Created On, we'll just use the first response for each contact
             forms_df['Created On'] = pd.Timestamp.now()
         
-        # Get unique questions per event
-        event_questions = forms_df.groupby('Event')['Question'].unique()
+        # Get unique questions per event (events sorted, questions in order of appearance)
+        pairs = (forms_df.loc[forms_df['Event'].notna(), ['Event', 'Question']]
+                 .drop_duplicates()
+                 .sort_values('Event', kind='stable'))
         logger.info("Found form questions by event:")
-        for event in event_questions.index:
+        for event, questions in pairs.groupby('Event', sort=False)['Question']:
             logger.info(f"\n{event}:")
-            for question in event_questions[event]:
+            for question in questions:
                 logger.info(f"  - {question}")
         
-        # For each event and question, create a column and populate responses
-        for event in event_questions.index:
-            for question in event_questions[event]:
-                column_name = f"{event} ~ {question}"
-                
-                # Get responses for this event and question
-                event_question_responses = forms_df[
-                    (forms_df['Event'] == event) & 
-                    (forms_df['Question'] == question)
-                ].copy()
-                
-                # Check for duplicates
-                duplicates = event_question_responses.groupby('Contact ID').size()
-                if (duplicates > 1).any():
-                    logger.warning(f"Found duplicate responses for {event} - {question}:")
-                    for contact_id in duplicates[duplicates > 1].index:
-                        dupes = event_question_responses[event_question_responses['Contact ID'] == contact_id]
-                        logger.warning(f"Contact ID: {contact_id}")
-                        for _, dupe in dupes.iterrows():
-                            logger.warning(f"  Response: {dupe['Response']}")
-                            logger.warning(f"  Created On: {dupe['Created On']}")
-                
-                # Keep only the most recent response for each contact
-                latest_responses = (event_question_responses
-                                  .sort_values('Created On', ascending=False)
-                                  .groupby('Contact ID', as_index=False)
-                                  .first())
-                
-                # Create a dictionary mapping Contact ID to Response instead of using Series
-                response_dict = dict(zip(latest_responses['Contact ID'], latest_responses['Response']))
-                
-                # Add responses to main DataFrame using the dictionary
-                df[column_name] = df['Contact ID'].map(response_dict)
+        answered = forms_df.dropna(subset=['Contact ID', 'Event', 'Question'])
+        
+        # Summarize contacts with more than one response to the same question
+        counts = answered.groupby(['Event', 'Question', 'Contact ID']).size()
+        duplicates = counts[counts > 1]
+        if not duplicates.empty:
+            summary = duplicates.groupby(level=['Event', 'Question']).agg(['size', 'max'])
+            for (event, question), row in summary.iterrows():
+                logger.warning(f"Found duplicate responses for {event} - {question}: "
+                               f"{row['size']} contacts with up to {row['max']} responses, keeping the latest")
+            logger.debug(f"Contacts with duplicate responses: {duplicates.index.get_level_values('Contact ID').unique().tolist()}")
+        
+        # Keep only the most recent non-blank response for each contact and question
+        latest_responses = (answered
+                            .dropna(subset=['Response'])
+                            .sort_values('Created On', ascending=False, kind='stable')
+                            .drop_duplicates(['Contact ID', 'Event', 'Question']))
+        
+        # One Contact ID x (event, question) grid
+        grid = latest_responses.pivot(index='Contact ID', columns=['Event', 'Question'], values='Response')
+        
+        # Add a "{event} ~ {question}" column for every question, even ones nobody answered
+        response_columns = {}
+        for event, question in pairs.itertuples(index=False):
+            column_name = f"{event} ~ {question}"
+            if (event, question) in grid.columns:
+                response_columns[column_name] = grid[(event, question)].to_numpy()
+            else:
+                response_columns[column_name] = np.nan
         
-        return df
+        return pd.DataFrame(response_columns, index=grid.index), {}
 
     def add_qr_codes(self, df: pd.DataFrame, qr_df: pd.DataFrame) -> pd.DataFrame:
         """Add QR code information."""
+        return self._join_columns(df, *self.qr_code_columns(qr_df))
+
+    def qr_code_columns(self, qr_df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, object]]:
+        """
+        Build the QR Code column from each contact's latest QR code.
+        
+        Returns:
+            QR codes indexed by Contact ID, and the fill value mapping (an
+            empty QR Code column when there is no usable QR data)
+        """
         # Check if qr_df is empty - some events may not have QR codes yet
         if qr_df.empty or len(qr_df) == 0:
             logger.info("No QR code data found - skipping QR code column")
-            df['QR Code'] = ''  # Add empty QR Code column for consistency
-            return df
+            # Add empty QR Code column for consistency
+            return pd.DataFrame(columns=['QR Code']), {'QR Code': ''}
         
         logger.debug("QR codes file columns:")
         logger.debug(qr_df.columns.tolist())
@@ -363,8 +452,8 @@ class EventRegistrationProcessorV3:
             logger.warning("Missing required columns in QR codes data!")
             logger.warning(f"Missing columns: {missing_columns}")
             logger.warning("This event may not have QR codes. Skipping QR code column.")
-            df['QR Code'] = ''  # Add empty QR Code column
-            return df
+            # Add empty QR Code column
+            return pd.DataFrame(columns=['QR Code']), {'QR Code': ''}
         
         # Ensure Created On is properly parsed as datetime
         try:
@@ -378,8 +467,8 @@ class EventRegistrationProcessorV3:
         duplicates = qr_df.groupby('Contact ID').size()
         if (duplicates > 1).any():
             logger.warning("\nFound duplicate QR codes:")
-            for contact_id in duplicates[duplicates > 1].index:
-                dupes = qr_df[qr_df['Contact ID'] == contact_id]
+            duplicated = qr_df[qr_df['Contact ID'].isin(duplicates[duplicates > 1].index)]
+            for contact_id, dupes in duplicated.groupby('Contact ID'):
                 logger.warning(f"\nContact ID: {contact_id}")
                 for _, dupe in dupes.iterrows():
                     logger.warning(f"  QR Code: {dupe['QR Code']}")
@@ -392,79 +481,250 @@ class EventRegistrationProcessorV3:
                           .groupby('Contact ID', as_index=False)
                           .first())
         
-        # Create a dictionary mapping Contact ID to QR Code instead of using Series
-        qr_code_dict = dict(zip(latest_qr_codes['Contact ID'], latest_qr_codes['QR Code']))
+        qr_codes = latest_qr_codes.set_index('Contact ID')[['QR Code']]
+        logger.info(f"Added QR codes for {len(qr_codes)} contacts")
+        return qr_codes, {}
+
+    @staticmethod
+    def _join_columns(df: pd.DataFrame, lookup: pd.DataFrame, fill_values: Dict[str, object]) -> pd.DataFrame:
+        """
+        Align columns keyed by Contact ID to the attendee rows.
         
-        # Map QR codes to Contact IDs using the dictionary
-        df['QR Code'] = df['Contact ID'].map(qr_code_dict)
-        logger.info(f"Added QR codes for {len(qr_code_dict)} contacts")
-        return df
+        Args:
+            df: Attendee rows with a Contact ID column
+            lookup: Columns indexed by Contact ID
+            fill_values: Value per column for attendees missing from lookup
+        """
+        if lookup.columns.empty:
+            return df
+        block = lookup.reindex(df['Contact ID'])
+        columns = {}
+        for column in lookup.columns:
+            values = block[column]
+            if column in fill_values:
+                values = values.where(values.notna(), fill_values[column])
+            columns[column] = values.to_numpy()
+        return df.assign(**columns)
+
+    def load_datasets(self) -> Dict[str, pd.DataFrame]:
+        """Load the latest file of each type from the input directory."""
+        files = self.find_latest_files()
+        return {file_type: pd.read_excel(filename) for file_type, filename in files.items()}
 
-    def transform_and_merge(self) -> pd.DataFrame:
-        """Main function to transform and merge all data sources."""
+    def merge_datasets(self, datasets: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """
+        Merge the four data sets into one row per paid contact.
+        
+        Args:
+            datasets: DataFrames keyed by FileTypes
+        """
+        return self.merge_incremental(datasets).merged
+
+    def _compact_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Store repetitive columns as categoricals.
+        
+        Event membership, table and form response columns repeat a handful of
+        values (often just the event name) for every attendee; as categoricals
+        they take one small integer code per row instead of a Python string.
+        Text columns are chosen by name, not by how repetitive their values
+        happen to be, so a column gets the same dtype in every merge.
+        """
+        compact = {}
+        for column in df.columns:
+            values = df[column]
+            if not (values.dtype == object or isinstance(values.dtype, pd.StringDtype)):
+                continue
+            if column in CATEGORICAL_COLUMNS or (column not in IDENTITY_COLUMNS and column not in CONTACT_COLUMNS):
+                compact[column] = values.astype('category')
+        return df.assign(**compact) if compact else df
+
+    def _source_fingerprint(self, df: pd.DataFrame) -> Optional[str]:
+        """
+        Hash a data set's column names and contents.
+        
+        Returns:
+            Hex digest, or None if the data can't be hashed (its stage is
+            then always rebuilt)
+        """
         try:
-            # Find latest files
-            files = self.find_latest_files()
-            
-            # Load all data sources
-            reg_df = pd.read_excel(files[FileTypes.REGISTRATION])
-            seating_df = pd.read_excel(files[FileTypes.SEATING])
-            qr_df = pd.read_excel(files[FileTypes.QR_CODES])
-            forms_df = pd.read_excel(files[FileTypes.FORM_RESPONSES])
-            
-            # Process main registration data
-            result_df = self.process_registration_data(reg_df)
+            row_hashes = pd.util.hash_pandas_object(df, index=False)
+        except TypeError as e:
+            logger.debug(f"Could not fingerprint data, stage caching disabled: {e}")
+            return None
+        digest = hashlib.sha1(repr([str(col) for col in df.columns]).encode())
+        digest.update(row_hashes.to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def _build_stage(self, file_type: str, df: pd.DataFrame, fingerprint: Optional[str]) -> MergeStage:
+        """Run the merge stage for one data set."""
+        # Treat blank cells as missing, as they are when read back from Excel
+        # (this also leaves the caller's frames untouched)
+        df = df.replace('', np.nan)
+        if file_type == FileTypes.REGISTRATION:
+            return MergeStage(fingerprint, self._compact_columns(self.process_registration_data(df)))
+        if file_type == FileTypes.SEATING:
+            return MergeStage(fingerprint, *self.seating_columns(df))
+        if file_type == FileTypes.FORM_RESPONSES:
+            return MergeStage(fingerprint, *self.form_response_columns(df))
+        return MergeStage(fingerprint, *self.qr_code_columns(df))
+
+    def merge_incremental(self, datasets: Dict[str, pd.DataFrame],
+                          previous: Optional[MergeState] = None) -> MergeState:
+        """
+        Merge the data sets, reusing the stages of a previous merge whose input is unchanged.
+        
+        Each data set is fingerprinted; only stages (processed registrations,
+        seating, form responses, QR codes) whose data set changed are rebuilt.
+        When the registrations are unchanged the attendee rows are too, so the
+        columns of every other unchanged stage are copied from the previous
+        merged table as-is.
+        
+        Args:
+            datasets: DataFrames keyed by FileTypes
+            previous: State returned by an earlier merge of the same campaign
+        """
+        stages = {}
+        rebuilt = []
+        for file_type in MERGE_STAGES:
+            fingerprint = self._source_fingerprint(datasets[file_type])
+            cached = previous.stages.get(file_type) if previous is not None else None
+            if cached is not None and fingerprint is not None and cached.fingerprint == fingerprint:
+                stages[file_type] = cached
+            else:
+                stages[file_type] = self._build_stage(file_type, datasets[file_type], fingerprint)
+                rebuilt.append(file_type)
+        
+        if previous is not None and not rebuilt:
+            logger.info("No data changed since the previous merge, reusing it")
+            return MergeState(previous.merged, stages, previous.created_on)
+        if previous is not None:
+            logger.info(f"Rebuilt merge stages: {', '.join(rebuilt)}")
+        
+        same_rows = previous is not None and FileTypes.REGISTRATION not in rebuilt
+        created_on = previous.created_on if same_rows else self.created_on
+        merged = stages[FileTypes.REGISTRATION].lookup
+        for file_type in MERGE_STAGES[1:]:
+            stage = stages[file_type]
+            if same_rows and file_type not in rebuilt:
+                columns = previous.merged[stage.lookup.columns]
+            else:
+                columns = self._compact_columns(
+                    self._join_columns(merged[['Contact ID']], stage.lookup, stage.fill_values)
+                ).drop(columns='Contact ID')
+            merged = merged.assign(**columns)
+        return MergeState(merged, stages, created_on)
+
+    def transform_and_merge(self, datasets: Optional[Dict[str, pd.DataFrame]] = None,
+                            merge_state: Optional[MergeState] = None) -> pd.DataFrame:
+        """
+        Main function to transform and merge all data sources.
+        
+        Args:
+            datasets: Optional DataFrames keyed by FileTypes (e.g. straight from the
+                      CRM client). When omitted the latest Excel files in the
+                      input directory are loaded.
+            merge_state: Optional state from a previous run for the same campaign;
+                         only stages whose data set changed are rebuilt. The
+                         new state is left on ``self.merge_state``.
+        """
+        merged_df = self._merge_sorted(datasets, merge_state)
+        sub_event = self.config.sub_event if self.config is not None else None
+        return self.transform_merged(merged_df, sub_event)
+
+    def transform_and_merge_sub_events(self, sub_events: List[Optional[str]],
+                                       datasets: Optional[Dict[str, pd.DataFrame]] = None,
+                                       merge_state: Optional[MergeState] = None) -> Dict[Optional[str], pd.DataFrame]:
+        """
+        Merge once and produce one output per sub-event.
+        
+        Each output is what transform_and_merge returns with that sub-event
+        configured, but the data sets are merged a single time.
+        
+        Args:
+            sub_events: Sub-event names (None gives the unfiltered output)
+            datasets: Optional DataFrames keyed by FileTypes (see transform_and_merge)
+            merge_state: Optional state from a previous run for the same campaign
+        
+        Returns:
+            Dictionary mapping each sub-event to its processed DataFrame
+        """
+        merged_df = self._merge_sorted(datasets, merge_state)
+        outputs = {}
+        for sub_event in dict.fromkeys(sub_events):
+            outputs[sub_event] = self.transform_merged(merged_df, sub_event)
+        logger.info(f"Produced {len(outputs)} sub-event outputs from one merge")
+        return outputs
+
+    def _merge_sorted(self, datasets: Optional[Dict[str, pd.DataFrame]],
+                      merge_state: Optional[MergeState]) -> pd.DataFrame:
+        """Merge the data sets (reusing unchanged stages of merge_state) and sort by name."""
+        try:
+            if datasets is None:
+                datasets = self.load_datasets()
             
-            # Add information from other sources
-            result_df = self.add_seating_info(result_df, seating_df)
-            result_df = self.add_form_responses(result_df, forms_df)
-            result_df = self.add_qr_codes(result_df, qr_df)
+            self.merge_state = self.merge_incremental(datasets, merge_state)
             
             # Sort by last name, first name and reset index
-            result_df = result_df.sort_values(
+            return self.merge_state.merged.sort_values(
                 by=['Last Name', 'First Name']
             ).reset_index(drop=True)
             
-            # Filter by sub-event BEFORE preprocessing (so we work with original column names)
+        except Exception as e:
+            logger.error(f"Error during processing: {str(e)}")
+            raise
+
+    def transform_merged(self, merged_df: pd.DataFrame, sub_event: Optional[str] = None) -> pd.DataFrame:
+        """
+        Filter, preprocess and report on a merged table.
+        
+        Args:
+            merged_df: Sorted output of the merge stage (left unchanged)
+            sub_event: Optional sub-event to keep contacts and columns for
+        """
+        try:
+            result_df = merged_df
             has_config = hasattr(self, 'config') and self.config is not None
-            has_sub_event = has_config and hasattr(self.config, 'sub_event') and self.config.sub_event is not None
+            
+            # Filter by sub-event BEFORE preprocessing (so we work with original column names)
+            has_sub_event = sub_event is not None
             
             if has_sub_event:
-                logger.info(f"Filtering data for sub-event: {self.config.sub_event}")
+                logger.info(f"Filtering data for sub-event: {sub_event}")
                 # Check if the sub-event exists as a column
-                if self.config.sub_event not in result_df.columns:
-                    logger.warning(f"Sub-event column '{self.config.sub_event}' not found in DataFrame")
+                if sub_event not in result_df.columns:
+                    logger.warning(f"Sub-event column '{sub_event}' not found in DataFrame")
                     logger.info("Available columns:")
                     for col in result_df.columns:
                         logger.info(f"  - {col}")
                     return pd.DataFrame(columns=result_df.columns)  # Return empty DataFrame with same structure
                     
                 # Keep contacts where the sub-event column is not null (they are registered for this sub-event)
-                sub_event_contacts = result_df[result_df[self.config.sub_event].notna()]['Contact ID'].unique()
+                sub_event_contacts = result_df[result_df[sub_event].notna()]['Contact ID'].unique()
                 if len(sub_event_contacts) == 0:
-                    logger.warning(f"No contacts found for sub-event: {self.config.sub_event}")
+                    logger.warning(f"No contacts found for sub-event: {sub_event}")
                     return pd.DataFrame(columns=result_df.columns)  # Return empty DataFrame with same structure
                     
                 result_df = result_df[result_df['Contact ID'].isin(sub_event_contacts)].copy()
-                logger.info(f"Found {len(result_df)} contacts registered for {self.config.sub_event}")
+                logger.info(f"Found {len(result_df)} contacts registered for {sub_event}")
                 
                 # Filter columns to only include relevant ones for this sub-event
                 contact_columns = ['Contact ID', 'First Name', 'Last Name', 'Title', 'Local Club', 'Gender', 'Age']
                 relevant_columns = [col for col in contact_columns if col in result_df.columns]
                 
                 # Add the sub-event column itself
-                if self.config.sub_event in result_df.columns:
-                    relevant_columns.append(self.config.sub_event)
+                if sub_event in result_df.columns:
+                    relevant_columns.append(sub_event)
                     
                 # Add any related columns (e.g., table assignments, form responses)
                 for col in result_df.columns:
-                    if col.startswith(f"{self.config.sub_event} ~"):
+                    if col.startswith(f"{sub_event} ~"):
                         relevant_columns.append(col)
                         
                 # Filter to only relevant columns
                 result_df = result_df[relevant_columns]
                 
-                logger.info(f"Filtered to {len(relevant_columns)} relevant columns for {self.config.sub_event}:")
+                logger.info(f"Filtered to {len(relevant_columns)} relevant columns for {sub_event}:")
                 for col in relevant_columns:
                     logger.info(f"  - {col}")
             
@@ -497,36 +757,23 @@ class EventRegistrationProcessorV3:
                     
                     filter_conditions.append(contact_id_condition)
                 
-                # Add date filter condition (need to get this from original registration data)
+                # Add date filter condition (uses the registration dates kept from the merge)
                 if has_date_filter:
                     logger.info(f"Adding date filter for registrations on or after: {self.config.created_on_datetime}")
                     
-                    # Re-load registration data to get Created On column for filtering
-                    files = self.find_latest_files()
-                    reg_df_for_date = pd.read_excel(files[FileTypes.REGISTRATION])
-                    reg_df_for_date.columns = reg_df_for_date.columns.astype(str).str.strip()
-                    
-                    # Standardize columns to find Created On
-                    reg_df_for_date, _ = self._standardize_columns(reg_df_for_date, RegistrationColumns.MAPPINGS)
-                    
-                    if 'Created On' in reg_df_for_date.columns:
+                    created_on = self.merge_state.created_on
+                    if created_on is not None:
                         try:
-                            # Parse Created On column
-                            reg_df_for_date['Created On'] = pd.to_datetime(reg_df_for_date['Created On'])
-                            
                             # Convert to timezone-aware datetime if not already
-                            if reg_df_for_date['Created On'].dt.tz is None:
+                            if created_on.dt.tz is None:
                                 # Assume the data is in the configured timezone
-                                reg_df_for_date['Created On'] = reg_df_for_date['Created On'].dt.tz_localize(self.config.tz)
+                                created_on = created_on.dt.tz_localize(self.config.tz)
                             else:
                                 # Convert to the configured timezone
-                                reg_df_for_date['Created On'] = reg_df_for_date['Created On'].dt.tz_convert(self.config.tz)
+                                created_on = created_on.dt.tz_convert(self.config.tz)
                             
-                            # Filter registration data by date
-                            date_filtered_registrations = reg_df_for_date[
-                                reg_df_for_date['Created On'] >= self.config.created_on_datetime
-                            ]
-                            date_contact_ids = set(date_filtered_registrations['Contact ID'].unique())
+                            # Contacts with any registration on or after the date
+                            date_contact_ids = set(created_on.index[created_on >= self.config.created_on_datetime])
                             
                             logger.info(f"Found {len(date_contact_ids)} contacts registered on or after the specified date")
                             
@@ -537,7 +784,7 @@ class EventRegistrationProcessorV3:
                             logger.warning(f"Could not apply date filter: {str(e)}")
                             logger.warning("Proceeding without date filtering")
                     else:
-                        logger.warning("Created On column not found in registration data - skipping date filter")
+                        logger.warning("Created On could not be read from registration data - skipping date filter")
                 
                 # Combine filters with OR logic
                 if filter_conditions:
@@ -578,8 +825,11 @@ class EventRegistrationProcessorV3:
                 else:
                     logger.info("No valid filter conditions to apply")
             
-            # Collect and generate statistics
-            self.stats_reporter.collect_statistics(result_df)
+            # Collect and generate statistics (the campaign summary can't apply the ID/date filters)
+            if self.campaign_summary is not None and not (has_inclusion_list or has_date_filter):
+                self.stats_reporter.collect_summary_statistics(self.campaign_summary, sub_event)
+            else:
+                self.stats_reporter.collect_statistics(result_df)
             self.stats_reporter.generate_report()
             
             return result_df
@@ -588,47 +838,23 @@ class EventRegistrationProcessorV3:
             logger.error(f"Error during processing: {str(e)}")
             raise
 
-    def save_output(self, df: pd.DataFrame) -> None:
-        """Save the merged data to an Excel file with appropriate name."""
-        output_filename = (self.config.get_output_filename() if self.config 
-                         else f'MAIL_MERGE_v3_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
-        
-        # Save the DataFrame to Excel
-        df.to_excel(output_filename, index=False)
-        
-        # Add filters and freeze top row using openpyxl
-        wb = load_workbook(output_filename)
-        ws = wb.active
-
-        # Freeze the top row
-        ws.freeze_panes = 'A2'  # This freezes row 1 (header row)
-        
-        # Add filters to the top row
-        ws.auto_filter.ref = ws.dimensions
-
-        # Set column widths based on the longest header or value in each column
-        lengths = (
-            pd.concat([
-                df.columns.to_series().map(len),                   # header lengths
-                df.astype(str).applymap(len).max(axis=0)           # max per column
-            ], axis=1)
-            .max(axis=1)                                           # take the larger of the two
-        )
-        
-        for idx, (col_name, max_len) in enumerate(lengths.iteritems(), start=1):
-            col_letter = get_column_letter(idx)
-            ws.column_dimensions[col_letter].width = max_len + 2
-
+    def save_output(self, df: pd.DataFrame) -> str:
+        """Save the merged data to an Excel file with appropriate name in the input directory."""
+        output_filename = os.path.join(
+            self.input_dir,
+            self.config.get_output_filename() if self.config
+            else f'MAIL_MERGE_v3_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
         
-        # Save the workbook with the new formatting
-        wb.save(output_filename)
+        # Header, filters and widths are written in the same pass as the rows
+        write_excel(df, output_filename)
         
         logger.info(f"Merged data saved to: {output_filename} (with frozen header and filters)")
+        return output_filename
 
-def main(sub_event: Optional[str] = None):
+def main(sub_event: Optional[str] = None, input_dir: str = '.'):
     try:
         # Initialize processor
-        processor = EventRegistrationProcessorV3()
+        processor = EventRegistrationProcessorV3(input_dir=input_dir)
         
         # Find latest files and load registration data to get main event
         files = processor.find_latest_files()
@@ -644,7 +870,7 @@ def main(sub_event: Optional[str] = None):
         ) if sub_event else None
         
         # Reinitialize processor with configuration
-        processor = EventRegistrationProcessorV3(config)
+        processor = EventRegistrationProcessorV3(config, input_dir=input_dir)
         
         # Process and merge all data
         merged_df = processor.transform_and_merge()
@@ -654,7 +880,7 @@ def main(sub_event: Optional[str] = None):
         
     except Exception as e:
         logger.error(f"Error: {str(e)}")
-        logger.error("\nPlease ensure all required files are present in the current directory with the correct naming format:")
+        logger.error("\nPlease ensure all required files are present in the input directory with the correct naming format:")
         logger.error("  - Registration List: *Registration List*.xlsx")
         logger.error("  - Seating Chart: *Seating Chart*.xlsx")
         logger.error("  - QR Codes: *QR Codes*.xlsx")
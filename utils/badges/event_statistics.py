@@ -47,6 +47,53 @@ class EventStatisticsReport:
             else:  # Form response columns
                 self._process_form_response(df, col)
                 
+    def collect_summary_statistics(self, summary, event=None, paid_status='Paid'):
+        """
+        Collect statistics from server-side count frames instead of a DataFrame.
+        
+        Args:
+            summary: Output of DynamicsCRMClient.get_campaign_summary()
+            event: Only collect statistics for this sub-event
+            paid_status: Status counted as a confirmed registration
+        """
+        if not GENERATE_STATISTICS:
+            logger.info("Statistics collection is disabled")
+            return
+            
+        logger.debug("Collecting statistics from CRM summary")
+        
+        registrations = summary['registrations']
+        clubs = summary.get('clubs')
+        form_responses = summary.get('form_responses')
+        if event is not None:
+            registrations = registrations[registrations['Event'] == event]
+            if clubs is not None:
+                clubs = clubs[clubs['Event'] == event]
+            if form_responses is not None:
+                form_responses = form_responses[form_responses['Event'] == event]
+        
+        totals = registrations.groupby('Event')['Count'].sum()
+        paid = registrations[registrations['Status'] == paid_status].groupby('Event')['Count'].sum()
+        if clubs is not None:
+            clubs = clubs[clubs['Status'] == paid_status]
+        
+        for event_name, total in totals.items():
+            yes = int(paid.get(event_name, 0))
+            self.event_stats[event_name] = {
+                'total': int(total),
+                'yes': yes,
+                'no': int(total) - yes,
+            }
+            if clubs is not None and not clubs.empty:
+                club_counts = clubs[clubs['Event'] == event_name].groupby('Local Club')['Count'].sum()
+                self.event_stats[event_name]['club_breakdown'] = club_counts.sort_values(ascending=False).to_dict()
+        
+        if form_responses is not None:
+            for (event_name, question), group in form_responses.groupby(['Event', 'Question']):
+                self.form_responses[f"{event_name} ~ {question}"] = {
+                    'responses': group.groupby('Response')['Count'].sum().to_dict()
+                }
+                
     def _process_event_column(self, df, col):
         """Process a single event column."""
         logger.debug(f"Processing event column: {col}")
@@ -141,12 +141,12 @@ class FileValidator:
         return None
 
     @staticmethod
-    def find_latest_files(directory: str = '.') -> Dict[str, str]:
+    def find_latest_files(directory: str) -> Dict[str, str]:
         """
         Find the latest version of each file type in the directory.
         
         Args:
-            directory: Directory to search in (defaults to current directory)
+            directory: Directory to search in
             
         Returns:
             Dictionary mapping file types to their latest filenames
@@ -1,13 +1,99 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Callable, Optional, List, Tuple, Pattern
+import numpy as np
 import pandas as pd
 import logging
-from dataclasses import dataclass
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from datetime import datetime
 import pytz
 
 logger = logging.getLogger(__name__)
 
+# Compiled transform plans kept across runs (database templates build a new class per request)
+TRANSFORM_PLAN_CACHE_SIZE = 16
+
+# Distinct values remembered per plan before its memo is reset
+TRANSFORM_MEMO_LIMIT = 100000
+
+_plan_cache = OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+# Marks a value not yet in a transform memo (results may themselves be None)
+_MISSING = object()
+
+
+def transform_unique(values: pd.Series, func: Callable[[Any], Any], na_value: Any = None,
+                     memo: Optional[Dict[str, Any]] = None) -> pd.Series:
+    """
+    Apply func to each distinct value of a column and broadcast the results back.
+    
+    String columns are factorized so func runs once per distinct value; other
+    columns fall back to calling func per cell.
+    
+    Args:
+        values: Column to transform
+        func: Function of one non-null value
+        na_value: Replacement for missing values (kept as-is when None)
+        memo: Optional dict of earlier results, reused and extended across calls
+    
+    Returns:
+        Transformed column (object dtype) with the same index
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return _transform_categorical(values, func, na_value, memo)
+    
+    result = values.astype(object)
+    present = values.notna().to_numpy()
+    if na_value is not None:
+        result[~present] = na_value
+    if not present.any():
+        return result
+    
+    texts = values[present]
+    if pd.api.types.infer_dtype(texts, skipna=False) != 'string':
+        result[present] = texts.map(func).to_numpy(dtype=object)
+        return result
+    
+    codes, uniques = pd.factorize(texts)
+    if memo is None:
+        transformed = [func(text) for text in uniques]
+    else:
+        if len(memo) > TRANSFORM_MEMO_LIMIT:
+            memo.clear()
+        transformed = []
+        for text in uniques:
+            # Single lookup: plans are shared across requests and another thread may clear the memo
+            value = memo.get(text, _MISSING)
+            if value is _MISSING:
+                value = func(text)
+                memo[text] = value
+            transformed.append(value)
+    result[present] = np.asarray(transformed, dtype=object)[codes]
+    return result
+
+
+def _transform_categorical(values: pd.Series, func: Callable[[Any], Any], na_value: Any,
+                           memo: Optional[Dict[str, Any]]) -> pd.Series:
+    """Transform a categorical column through its categories, keeping it categorical."""
+    categories = pd.Series(values.cat.categories.to_numpy(dtype=object))
+    outputs = list(transform_unique(categories, func, memo=memo))
+    codes = values.cat.codes.to_numpy()
+    if na_value is not None:
+        outputs.append(na_value)
+        codes = np.where(codes == -1, len(outputs) - 1, codes)
+    
+    if pd.api.types.infer_dtype(outputs, skipna=True) != 'string':
+        result = np.asarray(outputs + [np.nan], dtype=object)[codes]
+        return pd.Series(result, index=values.index, dtype=object)
+    
+    # Different categories may map to the same output, so re-factorize the outputs
+    output_codes, new_categories = pd.factorize(pd.Series(outputs, dtype=object))
+    new_codes = np.where(codes == -1, -1, output_codes[codes])
+    return pd.Series(pd.Categorical.from_codes(new_codes, categories=new_categories), index=values.index)
+
 @dataclass
 class PreprocessingConfig:
     """Configuration for preprocessing."""
@@ -93,6 +179,70 @@ class PreprocessingConfig:
             return f"{prefix}_{clean_name}_{timestamp}.xlsx"
         return f"{prefix}_v3_{timestamp}.xlsx"
 
+@dataclass(frozen=True)
+class ValueTransformPlan:
+    """Exact and contains mappings compiled once for fast value preprocessing."""
+    value_mappings: Dict[str, str]
+    contains_mappings: Tuple[Tuple[str, str], ...]
+    # Matches any contains key; values it misses skip the replacement loop
+    contains_pattern: Optional[Pattern]
+    # Results for values already seen, shared by every run using this plan
+    memo: Dict[str, str] = field(default_factory=dict, compare=False, repr=False)
+    
+    @classmethod
+    def compile(cls, value_mappings: Dict[str, str], contains_mappings: Dict[str, str]) -> 'ValueTransformPlan':
+        """Build a plan from a preprocessor's value and contains mappings."""
+        contains = tuple(contains_mappings.items())
+        pattern = None
+        if contains:
+            pattern = re.compile('|'.join(re.escape(key) for key, _ in contains))
+        return cls(dict(value_mappings), contains, pattern)
+    
+    @classmethod
+    def cached(cls, value_mappings: Dict[str, str], contains_mappings: Dict[str, str]) -> 'ValueTransformPlan':
+        """Return the shared plan for these mappings, compiling it on first use."""
+        try:
+            key = (tuple(value_mappings.items()), tuple(contains_mappings.items()))
+            hash(key)
+        except TypeError:
+            return cls.compile(value_mappings, contains_mappings)
+        
+        with _plan_cache_lock:
+            plan = _plan_cache.get(key)
+            if plan is None:
+                plan = _plan_cache[key] = cls.compile(value_mappings, contains_mappings)
+            _plan_cache.move_to_end(key)
+            while len(_plan_cache) > TRANSFORM_PLAN_CACHE_SIZE:
+                _plan_cache.popitem(last=False)
+        return plan
+    
+    def transform(self, text: str) -> str:
+        """Preprocess one non-null value already converted to a string."""
+        value = text.strip()
+        
+        # First try exact match
+        if value in self.value_mappings:
+            return self.value_mappings[value].strip()
+        
+        # Then try contains matches, in order, each on the result of the last
+        if self.contains_pattern is None or not self.contains_pattern.search(value):
+            return value
+        for contains_text, replacement in self.contains_mappings:
+            if contains_text in value:
+                value = value.replace(contains_text, replacement).strip()
+        return value
+    
+    def transform_series(self, values: pd.Series) -> pd.Series:
+        """Preprocess a column, transforming each distinct value only once."""
+        if (isinstance(values.dtype, pd.CategoricalDtype)
+                and pd.api.types.infer_dtype(values.cat.categories, skipna=True) == 'string'):
+            return transform_unique(values, self.transform, na_value='', memo=self.memo)
+        
+        present = values.notna()
+        strings = values.astype(object).where(~present, values.astype(str))
+        return transform_unique(strings, self.transform, na_value='', memo=self.memo)
+
+
 class PreprocessingBase(ABC):
     """Abstract base class for event preprocessing."""
     
@@ -148,25 +298,24 @@ class PreprocessingBase(ABC):
         # Handle regular names
         return name.strip().title()
     
+    def get_transform_plan(self) -> ValueTransformPlan:
+        """Get the compiled plan for this preprocessor's mappings (shared across runs)."""
+        plan = getattr(self, '_transform_plan', None)
+        if plan is None:
+            plan = ValueTransformPlan.cached(self.get_value_mappings(), self.get_contains_mappings())
+            self._transform_plan = plan
+        return plan
+    
     def preprocess_value(self, value: Any, column_name: Optional[str] = None) -> str:
         """Replace values according to the mapping dictionary."""
         if pd.isna(value):  # Handle NaN/None values
             return ''
-            
-        value = str(value).strip()  # Convert to string and strip whitespace
+        return self.get_transform_plan().transform(str(value))
 
-        # First try exact match
-        value_mappings = self.get_value_mappings()
-        if value in value_mappings:
-            return value_mappings[value].strip()
-
-        # Then try contains match
-        contains_mappings = self.get_contains_mappings()
-        for contains_text, replacement in contains_mappings.items():
-            if contains_text in value:
-                value = value.replace(contains_text, replacement).strip()
-        
-        return value
+    def _preprocess_column(self, values: pd.Series, column: str) -> pd.Series:
+        """Run an overridden preprocess_value over a column, calling it once per distinct value."""
+        return transform_unique(values, lambda value: self.preprocess_value(value, column),
+                                na_value=self.preprocess_value(np.nan, column))
 
     def _get_relevant_columns(self, df: pd.DataFrame, sub_event: str) -> List[str]:
         """Get list of columns relevant for the sub-event."""
@@ -227,15 +376,22 @@ class PreprocessingBase(ABC):
             if old_col in df.columns:
                 logger.info(f"Formatting and renaming {old_col} to {new_col}...")
                 # Format the names
-                df[old_col] = df[old_col].apply(self._format_name)
+                df[old_col] = transform_unique(df[old_col], self._format_name)
                 # Rename the column
                 df = df.rename(columns={old_col: new_col})
         
         # Apply preprocessing to all other string columns
         logger.info("Preprocessing remaining data values...")
-        for column in df.select_dtypes(include=['object']).columns:
-            if column not in self.NAME_COLUMNS.values():  # Skip name columns as they're already processed
-                df.loc[0:, column] = df.loc[0:, column].apply(lambda x: self.preprocess_value(x, column))
+        plan = self.get_transform_plan()
+        custom_values = type(self).preprocess_value is not PreprocessingBase.preprocess_value
+        for column in df.select_dtypes(include=['object', 'category']).columns:
+            if column in self.NAME_COLUMNS.values():  # Skip name columns as they're already processed
+                continue
+            if custom_values:
+                # Subclasses overriding preprocess_value still see every value (once per distinct value)
+                df[column] = self._preprocess_column(df[column], column)
+            else:
+                df[column] = plan.transform_series(df[column])
         
         # Sub-event filtering is now handled at the main level before preprocessing
         # Just ensure we have all required columns that exist in the dataframe
@@ -0,0 +1,241 @@
+"""
+Caching for Dynamics CRM lookups.
+
+``cache_with_ttl`` keeps results in an in-process LRU map. When
+DYNAMICS_CACHE_PATH is set, it also writes them to a SQLite file so every
+gunicorn worker shares them. Entries past their TTL are still served for a
+grace period while a background thread refreshes them, so callers such as
+the campaign dropdowns never wait on the CRM for a warm key.
+"""
+
+import os
+import time
+import pickle
+import sqlite3
+import inspect
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Entries kept per decorated function
+CACHE_MAX_ENTRIES = 256
+
+
+class MemoryCacheBackend:
+    """Thread-safe LRU map of key -> (value, stored_at)."""
+
+    def __init__(self, maxsize: int = CACHE_MAX_ENTRIES):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: Any, stored_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend:
+    """Cache entries in a SQLite file so they are shared across processes."""
+
+    def __init__(self, db_path: str, namespace: str, maxsize: int = CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.namespace = namespace
+        self.maxsize = maxsize
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, stored_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (time.time(), self.namespace, key)
+            )
+        return pickle.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, stored_at: float) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, pickle.dumps(value), stored_at, time.time())
+            )
+            # Evict least recently used entries beyond maxsize
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key NOT IN ("
+                "SELECT key FROM cache_entries WHERE namespace = ? ORDER BY accessed_at DESC LIMIT ?)",
+                (self.namespace, self.namespace, self.maxsize)
+            )
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+
+def cache_with_ttl(ttl_seconds=300, stale_seconds=None, maxsize=CACHE_MAX_ENTRIES, db_path=None):
+    """
+    Decorator to cache function results with a time-to-live.
+
+    For methods the cache key ignores ``self``, so every client instance
+    shares the same entries. After ``ttl_seconds`` an entry is still returned
+    for up to ``stale_seconds`` more while a background refresh runs.
+
+    Args:
+        ttl_seconds: Cache lifetime in seconds (default 5 minutes)
+        stale_seconds: Extra time a stale entry may be served while refreshing
+                       (defaults to ttl_seconds)
+        maxsize: Maximum number of entries kept (least recently used are evicted)
+        db_path: SQLite file shared across processes (defaults to DYNAMICS_CACHE_PATH)
+    """
+    stale_seconds = ttl_seconds if stale_seconds is None else stale_seconds
+    # Read at decoration time so values loaded from config/.env are honoured
+    db_path = db_path or os.getenv('DYNAMICS_CACHE_PATH')
+
+    def decorator(func: Callable) -> Callable:
+        params = list(inspect.signature(func).parameters)
+        is_method = bool(params) and params[0] == 'self'
+
+        memory = MemoryCacheBackend(maxsize)
+        shared = None
+        if db_path:
+            try:
+                shared = SQLiteCacheBackend(db_path, func.__qualname__, maxsize)
+            except sqlite3.Error as e:
+                logger.warning(f"Shared cache unavailable for {func.__qualname__}, using memory only: {e}")
+
+        refreshing = set()
+        refresh_lock = threading.Lock()
+        key_locks = {}
+
+        def lookup(key):
+            entry = memory.get(key)
+            if entry is None and shared is not None:
+                try:
+                    entry = shared.get(key)
+                except sqlite3.Error as e:
+                    logger.warning(f"Shared cache read failed for {func.__name__}: {e}")
+                if entry is not None:
+                    memory.set(key, *entry)
+            return entry
+
+        def store(key, value):
+            stored_at = time.time()
+            memory.set(key, value, stored_at)
+            if shared is not None:
+                try:
+                    shared.set(key, value, stored_at)
+                except sqlite3.Error as e:
+                    logger.warning(f"Shared cache write failed for {func.__name__}: {e}")
+
+        def refresh(key, args, kwargs):
+            try:
+                store(key, func(*args, **kwargs))
+                logger.debug(f"Background refresh finished for {func.__name__}")
+            except Exception as e:
+                logger.warning(f"Background refresh failed for {func.__name__}: {e}")
+            finally:
+                with refresh_lock:
+                    refreshing.discard(key)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # Create cache key from function name and arguments (excluding self)
+            key_args = args[1:] if is_method else args
+            cache_key = repr((func.__qualname__, key_args, sorted(kwargs.items())))
+
+            entry = lookup(cache_key)
+            if entry is not None:
+                value, stored_at = entry
+                age = time.time() - stored_at
+                if age < ttl_seconds:
+                    logger.debug(f"Cache hit for {func.__name__}")
+                    return value
+                if age < ttl_seconds + stale_seconds:
+                    with refresh_lock:
+                        start_refresh = cache_key not in refreshing
+                        refreshing.add(cache_key)
+                    if start_refresh:
+                        logger.debug(f"Cache stale for {func.__name__}, refreshing in background")
+                        threading.Thread(target=refresh, args=(cache_key, args, kwargs), daemon=True).start()
+                    return value
+                logger.debug(f"Cache expired for {func.__name__}")
+
+            # Only one thread fetches a missing key; the others wait for its result
+            with refresh_lock:
+                # [lock, number of threads holding or waiting for it]
+                key_entry = key_locks.setdefault(cache_key, [threading.Lock(), 0])
+                key_entry[1] += 1
+                key_lock = key_entry[0]
+            try:
+                with key_lock:
+                    entry = memory.get(cache_key)
+                    if entry is not None and time.time() - entry[1] < ttl_seconds:
+                        return entry[0]
+
+                    logger.debug(f"Cache miss for {func.__name__}, fetching fresh data")
+                    result = func(*args, **kwargs)
+                    store(cache_key, result)
+                    return result
+            finally:
+                # Drop the lock once the last waiter is done (also when func raises);
+                # while anyone still waits, later callers must queue on the same lock
+                with refresh_lock:
+                    key_entry[1] -= 1
+                    if key_entry[1] == 0:
+                        key_locks.pop(cache_key, None)
+
+        # Add method to clear cache
+        def clear_cache():
+            memory.clear()
+            if shared is not None:
+                shared.clear()
+            logger.info(f"Cache cleared for {func.__name__}")
+
+        wrapper.clear_cache = clear_cache
+        return wrapper
+
+    return decorator
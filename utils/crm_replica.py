@@ -0,0 +1,372 @@
+"""
+Local SQLite replica of campaign data pulled from Dynamics CRM.
+
+Each (campaign, data type) pair is stored as one row per CRM record, keyed
+on the record's primary key, together with the time of the last successful
+sync and of the last full pull. Subsequent pulls only need the records
+changed since then.
+
+With change tracking there is one delta link per entity set, shared by every
+campaign. Changes it reports are queued per affected campaign and applied
+the next time that campaign is pulled.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Check if running in Docker
+IN_DOCKER = os.environ.get('DOCKER_CONTAINER', False)
+BASE_PATH = '/app' if IN_DOCKER else '.'
+
+# Bump when the shape of stored rows changes so replicas are rebuilt
+REPLICA_SCHEMA_VERSION = 1
+
+DEFAULT_REPLICA_PATH = os.path.join(BASE_PATH, 'data', 'crm_replica.db')
+
+
+class CRMReplica:
+    """SQLite-backed store of campaign records, kept current with delta pulls."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialize the replica.
+
+        Args:
+            db_path: Path to the SQLite file (defaults to data/crm_replica.db)
+        """
+        # Read here rather than at import so values loaded from config/.env are honoured
+        self.db_path = db_path or os.getenv('DYNAMICS_REPLICA_PATH', DEFAULT_REPLICA_PATH)
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._write_lock = threading.Lock()
+        self._ensure_tables()
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection, commit on success and always close it."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _ensure_tables(self):
+        """Create replica tables if they don't exist."""
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS replica_rows (
+                    campaign_id TEXT NOT NULL,
+                    data_type TEXT NOT NULL,
+                    row_id TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (campaign_id, data_type, row_id)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS replica_state (
+                    campaign_id TEXT NOT NULL,
+                    data_type TEXT NOT NULL,
+                    last_sync TEXT NOT NULL,
+                    columns TEXT NOT NULL,
+                    schema_version INTEGER NOT NULL,
+                    full_sync TEXT,
+                    PRIMARY KEY (campaign_id, data_type)
+                )
+            """)
+            # Replicas created by older versions lack the full_sync column
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(replica_state)")}
+            if 'full_sync' not in columns:
+                conn.execute("ALTER TABLE replica_state ADD COLUMN full_sync TEXT")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS change_tracking (
+                    entity_set TEXT PRIMARY KEY,
+                    delta_link TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pending_changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    campaign_id TEXT NOT NULL,
+                    data_type TEXT NOT NULL,
+                    row_id TEXT NOT NULL,
+                    deleted INTEGER NOT NULL
+                )
+            """)
+
+    def get_last_sync(self, campaign_id: str, data_type: str) -> Optional[datetime]:
+        """
+        Get the time of the last successful sync.
+
+        Returns:
+            UTC datetime of the last sync, or None if a full pull is needed
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT last_sync, schema_version FROM replica_state WHERE campaign_id = ? AND data_type = ?",
+                (campaign_id, data_type)
+            ).fetchone()
+
+        if not row:
+            return None
+        if row[1] != REPLICA_SCHEMA_VERSION:
+            logger.info(f"Replica for {data_type} uses an old schema, forcing full sync")
+            return None
+        return datetime.fromisoformat(row[0])
+
+    def get_full_sync(self, campaign_id: str, data_type: str) -> Optional[datetime]:
+        """Get the time of the last full pull, or None if there hasn't been one."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT full_sync FROM replica_state WHERE campaign_id = ? AND data_type = ?",
+                (campaign_id, data_type)
+            ).fetchone()
+        return datetime.fromisoformat(row[0]) if row and row[0] else None
+
+    def expire_full_syncs(self, data_type: str) -> None:
+        """Make the next pull of every campaign for a data type a full pull."""
+        with self._write_lock, self._connect() as conn:
+            conn.execute("UPDATE replica_state SET full_sync = NULL WHERE data_type = ?", (data_type,))
+            conn.execute("DELETE FROM pending_changes WHERE data_type = ?", (data_type,))
+
+    def campaigns(self, data_type: str) -> List[str]:
+        """Get the campaigns replicated for a data type."""
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute(
+                "SELECT campaign_id FROM replica_state WHERE data_type = ?", (data_type,)
+            )]
+
+    def row_campaigns(self, data_type: str, row_ids: Iterable[str]) -> Dict[str, Set[str]]:
+        """Map each of the given primary keys to the campaigns whose replica holds that row."""
+        row_ids = [str(row_id) for row_id in row_ids]
+        holders = {}
+        with self._connect() as conn:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(row_ids), 500):
+                chunk = row_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for campaign_id, row_id in conn.execute(
+                    f"SELECT campaign_id, row_id FROM replica_rows WHERE data_type = ? AND row_id IN ({placeholders})",
+                    [data_type] + chunk
+                ):
+                    holders.setdefault(row_id, set()).add(campaign_id)
+        return holders
+
+    # ========== Change tracking ==========
+
+    def get_tracking_link(self, entity_set: str) -> Optional[str]:
+        """Get the shared change-tracking delta link of an entity set, if any."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT delta_link FROM change_tracking WHERE entity_set = ?", (entity_set,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save_tracking_link(self, entity_set: str, delta_link: Optional[str]) -> None:
+        """Store (or with None, forget) the shared delta link of an entity set."""
+        with self._write_lock, self._connect() as conn:
+            if delta_link:
+                conn.execute(
+                    "INSERT OR REPLACE INTO change_tracking (entity_set, delta_link) VALUES (?, ?)",
+                    (entity_set, delta_link)
+                )
+            else:
+                conn.execute("DELETE FROM change_tracking WHERE entity_set = ?", (entity_set,))
+
+    def add_pending(self, data_type: str, changes: Iterable[Tuple[str, str, bool]]) -> None:
+        """
+        Queue changes for campaigns to apply on their next pull.
+
+        Args:
+            changes: (campaign ID, primary key, deleted) tuples
+        """
+        rows = [(campaign_id, data_type, str(row_id), int(deleted)) for campaign_id, row_id, deleted in changes]
+        if not rows:
+            return
+        with self._write_lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO pending_changes (campaign_id, data_type, row_id, deleted) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def get_pending(self, campaign_id: str, data_type: str) -> Tuple[List[str], List[str], int]:
+        """
+        Get the changes queued for a campaign.
+
+        Returns:
+            Tuple of (changed primary keys, deleted primary keys, last queue
+            position read) - pass the position to clear_pending once applied
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, row_id, deleted FROM pending_changes WHERE campaign_id = ? AND data_type = ? ORDER BY seq",
+                (campaign_id, data_type)
+            ).fetchall()
+
+        # The latest change to a row decides whether it was deleted
+        latest = {row_id: bool(deleted) for _, row_id, deleted in rows}
+        changed = [row_id for row_id, deleted in latest.items() if not deleted]
+        deleted = [row_id for row_id, deleted in latest.items() if deleted]
+        return changed, deleted, rows[-1][0] if rows else 0
+
+    def clear_pending(self, campaign_id: str, data_type: str, up_to: int) -> None:
+        """Drop a campaign's queued changes up to and including a queue position."""
+        with self._write_lock, self._connect() as conn:
+            conn.execute(
+                "DELETE FROM pending_changes WHERE campaign_id = ? AND data_type = ? AND seq <= ?",
+                (campaign_id, data_type, up_to)
+            )
+
+    # ========== Rows ==========
+
+    @staticmethod
+    def _records(df: pd.DataFrame, key_column: str):
+        """Yield (row_id, json) pairs for each DataFrame row."""
+        for record in json.loads(df.to_json(orient='records', date_format='iso')):
+            row_id = record.get(key_column)
+            if row_id is None:
+                continue
+            yield str(row_id), json.dumps(record)
+
+    def replace(self, campaign_id: str, data_type: str, df: pd.DataFrame, key_column: str,
+                synced_at: datetime) -> None:
+        """Replace all stored rows with a full pull."""
+        with self._write_lock, self._connect() as conn:
+            conn.execute(
+                "DELETE FROM replica_rows WHERE campaign_id = ? AND data_type = ?",
+                (campaign_id, data_type)
+            )
+            self._upsert(conn, campaign_id, data_type, df, key_column)
+            self._save_state(conn, campaign_id, data_type, list(df.columns), synced_at, full_sync=synced_at)
+
+        logger.info(f"Replica for {data_type} rebuilt with {len(df)} rows")
+
+    def apply_delta(self, campaign_id: str, data_type: str, changed_df: pd.DataFrame, key_column: str,
+                    live_ids: Iterable[str], synced_at: datetime) -> None:
+        """
+        Apply a delta pull: upsert changed rows and delete rows no longer on the server.
+
+        Args:
+            changed_df: Rows modified since the last sync
+            key_column: Column holding the record's primary key
+            live_ids: Primary keys of every record currently in the campaign
+            synced_at: Time to record as the new sync point
+        """
+        live_ids = {str(row_id) for row_id in live_ids}
+
+        with self._write_lock, self._connect() as conn:
+            stored_ids = {row[0] for row in conn.execute(
+                "SELECT row_id FROM replica_rows WHERE campaign_id = ? AND data_type = ?",
+                (campaign_id, data_type)
+            )}
+            deleted_ids = stored_ids - live_ids
+            self._apply(conn, campaign_id, data_type, changed_df, key_column, deleted_ids, synced_at)
+
+        logger.info(f"Replica for {data_type}: {len(changed_df)} upserted, {len(deleted_ids)} deleted")
+
+    def apply_changes(self, campaign_id: str, data_type: str, changed_df: pd.DataFrame, key_column: str,
+                      removed_ids: Iterable[str], synced_at: datetime) -> None:
+        """
+        Apply a change-tracking delta: upsert changed rows and delete the given keys.
+
+        Args:
+            changed_df: New or updated rows belonging to the campaign
+            key_column: Column holding the record's primary key
+            removed_ids: Primary keys deleted on the server or no longer in the campaign
+            synced_at: Time to record as the new sync point
+        """
+        removed_ids = {str(row_id) for row_id in removed_ids}
+
+        with self._write_lock, self._connect() as conn:
+            self._apply(conn, campaign_id, data_type, changed_df, key_column, removed_ids, synced_at)
+
+        logger.info(f"Replica for {data_type}: {len(changed_df)} changed, {len(removed_ids)} removed via change tracking")
+
+    def _apply(self, conn, campaign_id, data_type, changed_df, key_column, removed_ids, synced_at):
+        if removed_ids:
+            conn.executemany(
+                "DELETE FROM replica_rows WHERE campaign_id = ? AND data_type = ? AND row_id = ?",
+                [(campaign_id, data_type, row_id) for row_id in removed_ids]
+            )
+
+        self._upsert(conn, campaign_id, data_type, changed_df, key_column)
+
+        # Keep any previously seen columns so the DataFrame shape is stable
+        columns = self._load_columns(conn, campaign_id, data_type)
+        columns += [col for col in changed_df.columns if col not in columns]
+        self._save_state(conn, campaign_id, data_type, columns, synced_at)
+
+    def _upsert(self, conn, campaign_id, data_type, df, key_column):
+        if df.empty:
+            return
+        if key_column not in df.columns:
+            raise ValueError(f"Key column '{key_column}' missing from {data_type} data")
+        conn.executemany(
+            "INSERT OR REPLACE INTO replica_rows (campaign_id, data_type, row_id, data) VALUES (?, ?, ?, ?)",
+            [(campaign_id, data_type, row_id, data) for row_id, data in self._records(df, key_column)]
+        )
+
+    def _load_columns(self, conn, campaign_id, data_type):
+        row = conn.execute(
+            "SELECT columns FROM replica_state WHERE campaign_id = ? AND data_type = ?",
+            (campaign_id, data_type)
+        ).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def _save_state(self, conn, campaign_id, data_type, columns, synced_at, full_sync=None):
+        # Delta pulls keep the time of the last full pull
+        if full_sync is None:
+            row = conn.execute(
+                "SELECT full_sync FROM replica_state WHERE campaign_id = ? AND data_type = ?",
+                (campaign_id, data_type)
+            ).fetchone()
+            full_sync = row[0] if row else None
+        else:
+            full_sync = full_sync.isoformat()
+        conn.execute(
+            "INSERT OR REPLACE INTO replica_state "
+            "(campaign_id, data_type, last_sync, columns, schema_version, full_sync) VALUES (?, ?, ?, ?, ?, ?)",
+            (campaign_id, data_type, synced_at.isoformat(), json.dumps(columns), REPLICA_SCHEMA_VERSION, full_sync)
+        )
+
+    def load(self, campaign_id: str, data_type: str) -> pd.DataFrame:
+        """Load the stored rows for a campaign and data type as a DataFrame."""
+        with self._connect() as conn:
+            columns = self._load_columns(conn, campaign_id, data_type)
+            rows = conn.execute(
+                "SELECT data FROM replica_rows WHERE campaign_id = ? AND data_type = ?",
+                (campaign_id, data_type)
+            ).fetchall()
+
+        if not rows:
+            return pd.DataFrame()
+
+        df = pd.DataFrame([json.loads(row[0]) for row in rows])
+        return df.reindex(columns=columns + [col for col in df.columns if col not in columns])
+
+    def clear(self, campaign_id: Optional[str] = None, data_type: Optional[str] = None) -> None:
+        """Remove stored rows (for one campaign and data type, one campaign, or all) so the next pull is a full sync."""
+        with self._write_lock, self._connect() as conn:
+            if campaign_id and data_type:
+                for table in ('replica_rows', 'replica_state', 'pending_changes'):
+                    conn.execute(f"DELETE FROM {table} WHERE campaign_id = ? AND data_type = ?",
+                                 (campaign_id, data_type))
+            elif campaign_id:
+                for table in ('replica_rows', 'replica_state', 'pending_changes'):
+                    conn.execute(f"DELETE FROM {table} WHERE campaign_id = ?", (campaign_id,))
+            else:
+                for table in ('replica_rows', 'replica_state', 'pending_changes', 'change_tracking'):
+                    conn.execute(f"DELETE FROM {table}")
+        scope = f" for campaign {campaign_id}" if campaign_id else ""
+        scope += f" ({data_type})" if campaign_id and data_type else ""
+        logger.info(f"Cleared CRM replica{scope}")
@@ -2,69 +2,281 @@ import os
 import json
 import logging
 import msal
+import random
 import requests
+import threading
 import time
-from typing import Dict, List, Optional, Callable, Any
-from datetime import datetime
-from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Callable, Any, Iterator, Tuple, Set
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
 import pandas as pd
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from utils.crm_replica import CRMReplica
+from utils.crm_cache import cache_with_ttl
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Cache decorator with TTL (Time To Live)
-def cache_with_ttl(ttl_seconds=300):
-    """
-    Decorator to cache function results with a time-to-live.
-    
-    Args:
-        ttl_seconds: Cache lifetime in seconds (default 5 minutes)
-    """
-    def decorator(func: Callable) -> Callable:
-        cache = {}
-        cache_times = {}
-        
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            # Create cache key from function name and arguments
-            cache_key = (func.__name__, str(args), str(sorted(kwargs.items())))
-            current_time = time.time()
-            
-            # Check if cached result exists and is still valid
-            if cache_key in cache and cache_key in cache_times:
-                if current_time - cache_times[cache_key] < ttl_seconds:
-                    logger.debug(f"Cache hit for {func.__name__}")
-                    return cache[cache_key]
-                else:
-                    logger.debug(f"Cache expired for {func.__name__}")
-            
-            # Call function and cache result
-            logger.debug(f"Cache miss for {func.__name__}, fetching fresh data")
-            result = func(*args, **kwargs)
-            cache[cache_key] = result
-            cache_times[cache_key] = current_time
-            
-            return result
-        
-        # Add method to clear cache
-        def clear_cache():
-            cache.clear()
-            cache_times.clear()
-            logger.info(f"Cache cleared for {func.__name__}")
-        
-        wrapper.clear_cache = clear_cache
-        return wrapper
-    
-    return decorator
-
 # Load .env from config directory
 IN_DOCKER = os.environ.get('DOCKER_CONTAINER', False)
 BASE_PATH = '/app' if IN_DOCKER else '.'
 CONFIG_PATH = '/config' if IN_DOCKER else f"{BASE_PATH}/config"
 load_dotenv(os.path.join(CONFIG_PATH, '.env'))
 
+# Data types pulled for a badge run, in processing order
+CAMPAIGN_DATA_TYPES = ["event_guests", "qr_codes", "table_reservations", "form_responses"]
+
+# Entity set, primary key and campaign filter (main event + sub-events) for each data type.
+# "membership" names the lookup (None for the record itself) and attributes holding the
+# campaign IDs the filter matches, used to route change-tracking deltas to campaigns.
+CAMPAIGN_QUERIES = {
+    "event_guests": {
+        "entity_set": "crca7_eventguests",
+        "primary_key": "crca7_eventguestid",
+        "prefix": "crca7_",
+        # Note: crca7_Event links to campaign entity, so use campaignid
+        "filter": "crca7_Event/campaignid eq {campaign_id} or crca7_Event/_aha_parentcampaign_value eq {campaign_id}",
+        # $select/$expand projection is derived from RegistrationColumns
+        "expand": None,
+        "membership": ("crca7_Event", ["campaignid", "_aha_parentcampaign_value"]),
+    },
+    "qr_codes": {
+        "entity_set": "aha_eventguestqrcodeses",
+        "primary_key": "aha_eventguestqrcodesid",
+        "prefix": "aha_",
+        # QR codes are linked to the main event only
+        "filter": "_aha_mainevent_value eq {campaign_id}",
+        # Expand to get Contact directly (not through Event Guest)
+        "expand": "$expand=aha_EventGuestContactId($select=contactid)",
+        "membership": (None, ["_aha_mainevent_value"]),
+    },
+    "table_reservations": {
+        "entity_set": "aha_tablereservations",
+        "primary_key": "aha_tablereservationid",
+        "prefix": "aha_",
+        "filter": "aha_Event/campaignid eq {campaign_id} or aha_Event/_aha_parentcampaign_value eq {campaign_id}",
+        "expand": "$expand=aha_Contact($select=contactid),aha_Event($select=name),aha_Table($select=aha_name)",
+        "membership": ("aha_Event", ["campaignid", "_aha_parentcampaign_value"]),
+    },
+    "form_responses": {
+        "entity_set": "aha_eventformresponseses",
+        "primary_key": "aha_eventformresponsesid",
+        "prefix": "aha_",
+        "filter": "aha_Campaign/campaignid eq {campaign_id} or aha_Campaign/_aha_parentcampaign_value eq {campaign_id}",
+        "expand": "$expand=aha_Contact($select=contactid),aha_Campaign($select=name),aha_FormQuestion($select=aha_newcolumn)",
+        "membership": ("aha_Campaign", ["campaignid", "_aha_parentcampaign_value"]),
+    },
+}
+
+# Annotation carrying the display value of option sets, lookups, etc.
+FORMATTED_SUFFIX = "@OData.Community.Display.V1.FormattedValue"
+
+# Maximum records per response page (Dataverse caps this at 5000)
+PAGE_SIZE = int(os.getenv('DYNAMICS_PAGE_SIZE', '5000'))
+
+# Refresh the access token this many seconds before it expires
+TOKEN_REFRESH_MARGIN = 300
+
+# Keep-alive connections held open to the CRM host
+HTTP_POOL_SIZE = int(os.getenv('DYNAMICS_HTTP_POOL_SIZE', '10'))
+
+# Serve campaign pulls from a local replica refreshed with modifiedon deltas (opt-in)
+REPLICA_ENABLED = os.getenv('DYNAMICS_REPLICA_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+# Overlap each delta window to tolerate clock skew between us and the CRM
+REPLICA_SYNC_OVERLAP_SECONDS = 120
+
+# Re-pull a campaign in full once its last full pull is this old. Delta pulls only
+# see rows whose own modifiedon changed, so columns expanded from related records
+# (contact names, member IDs, table and event names) are refreshed this way
+REPLICA_FULL_SYNC_SECONDS = int(os.getenv('DYNAMICS_REPLICA_FULL_SYNC_SECONDS', '900'))
+
+# Keep the replica current with Dataverse change tracking (one delta link per entity set) instead of modifiedon queries (opt-in)
+CHANGE_TRACKING = os.getenv('DYNAMICS_CHANGE_TRACKING', 'false').lower() in ('1', 'true', 'yes')
+
+# Changed records re-fetched per query when applying a delta
+CHANGE_FETCH_BATCH_SIZE = 100
+
+# Submit campaign metadata and entity queries as a single OData $batch request
+BATCH_REQUESTS = os.getenv('DYNAMICS_BATCH_REQUESTS', 'false').lower() in ('1', 'true', 'yes')
+
+# Parse collection responses incrementally into column buffers instead of response.json()
+STREAM_RESPONSES = os.getenv('DYNAMICS_STREAM_RESPONSES', 'true').lower() in ('1', 'true', 'yes')
+
+# Bytes read from the socket per chunk when streaming
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Retry policy for service-protection throttling (429) and transient server/network errors
+# (RETRY_BACKOFF_MAX caps our own back-off only; a server Retry-After is always honoured)
+MAX_RETRIES = int(os.getenv('DYNAMICS_MAX_RETRIES', '5'))
+RETRY_BACKOFF_BASE = 1.0
+RETRY_BACKOFF_MAX = 60.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Client-side request budget shared by every thread in the process
+# (Dataverse allows 6000 requests per user per 5 minutes, i.e. 20/s)
+REQUESTS_PER_SECOND = float(os.getenv('DYNAMICS_REQUESTS_PER_SECOND', '15'))
+REQUEST_BURST = int(os.getenv('DYNAMICS_REQUEST_BURST', '10'))
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the rate of outgoing requests."""
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> float:
+        """
+        Take one token, sleeping until one is available.
+        
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self._tokens) / self.rate
+            
+            time.sleep(delay)
+            waited += delay
+    
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for ``seconds`` (e.g. after the server sends Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class RequestMetrics:
+    """Counters for CRM requests, retries and time spent waiting on throttling."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self) -> None:
+        with self._lock:
+            self._counters = {
+                'requests': 0,
+                'retries': 0,
+                'throttled_responses': 0,
+                'transient_errors': 0,
+                'failed_requests': 0,
+                'rate_limit_wait_seconds': 0.0,
+                'retry_wait_seconds': 0.0,
+            }
+    
+    def record(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+    
+    def snapshot(self) -> Dict[str, float]:
+        """Return a copy of the current counters."""
+        with self._lock:
+            return dict(self._counters)
+
+
+_request_bucket = TokenBucket(REQUESTS_PER_SECOND, REQUEST_BURST)
+request_metrics = RequestMetrics()
+
+def get_request_metrics() -> Dict[str, float]:
+    """Return retry/throttling metrics for all CRM requests made by this process."""
+    return request_metrics.snapshot()
+
+# Settings the CRM client can't connect without
+CRM_REQUIRED_SETTINGS = ['DYNAMICS_TENANT_ID', 'DYNAMICS_CLIENT_ID', 'DYNAMICS_CLIENT_SECRET', 'DYNAMICS_CRM_URL']
+
+def crm_configured() -> bool:
+    """Return True if the Dynamics CRM connection settings are present."""
+    return all(os.getenv(name) for name in CRM_REQUIRED_SETTINGS)
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+def get_crm_client() -> 'DynamicsCRMClient':
+    """
+    Return the process-wide CRM client, creating it on first use.
+    
+    Sharing one client keeps the MSAL token cache and the HTTP connection
+    pool warm across requests instead of re-authenticating every time.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = DynamicsCRMClient()
+        return _shared_client
+
+class BatchPartError(Exception):
+    """A single operation inside a $batch response failed."""
+    
+    def __init__(self, status_code: int, message: str):
+        self.status_code = status_code
+        super().__init__(f"HTTP {status_code}: {message}")
+
+
+class DataPullError(Exception):
+    """Raised when one or more datasets fail during a concurrent campaign pull."""
+    
+    def __init__(self, failures: Dict[str, Exception], results: Dict[str, pd.DataFrame],
+                 timings: Dict[str, float]):
+        self.failures = failures
+        self.results = results
+        self.timings = timings
+        details = "; ".join(f"{data_type}: {error}" for data_type, error in failures.items())
+        super().__init__(f"Failed to pull {len(failures)} dataset(s): {details}")
+
 class DynamicsCRMClient:
+    # Mapping from flattened Event Guest API columns to Excel export column names
+    # NOTE: Only map expanded entity fields, NOT lookup GUIDs to avoid duplicates
+    EVENT_GUEST_COLUMN_MAPPING = {
+        # Don't map eventguestid or _existingcontact_value - use expanded contact data
+        'contact_contactid': 'Contact ID',
+        'contact_aha_memberid': 'Member ID (Existing Contact) (Contact)',
+        'contact_firstname': 'First Name (Existing Contact) (Contact)',
+        'contact_lastname': 'Last Name (Existing Contact) (Contact)',
+        'contact_salutation': 'Title (Existing Contact) (Contact)',  # Honorifics field (may be null)
+        'contact_aha_title': 'Title (Existing Contact) (Contact)',  # Alternative title field
+        'contact__aha_localclub2_value': 'Local Club (Existing Contact) (Contact)',  # Lookup field GUID
+        'contact_aha_localclub2': 'Local Club (Existing Contact) (Contact)',  # Alternative mapping
+        'contact_gendercode': 'Gender (Existing Contact) (Contact)',
+        'contact_crca7_age': 'Age (Existing Contact) (Contact)',
+        # Don't map _event_value - use expanded event name
+        'event_name': 'Event',
+        'statuscode': 'Status Reason',
+        'createdon': 'Created On',
+        'name': 'Name',
+    }
+    
+    # Expanded navigation properties on Event Guests, keyed by flattened column prefix
+    EVENT_GUEST_EXPANSIONS = {
+        'contact_': 'crca7_ExistingContact',
+        'event_': 'crca7_Event',
+    }
+    
+    # Logical names of top-level Event Guest attributes, keyed by flattened column
+    EVENT_GUEST_ATTRIBUTES = {
+        'statuscode': 'statuscode',
+        'createdon': 'createdon',
+        'name': 'crca7_name',
+    }
+    
     def __init__(self):
         self.tenant_id = os.getenv('DYNAMICS_TENANT_ID')
         self.client_id = os.getenv('DYNAMICS_CLIENT_ID')
@@ -75,61 +287,443 @@ class DynamicsCRMClient:
         if not all([self.tenant_id, self.client_id, self.client_secret, self.crm_url]):
             raise ValueError("Missing required environment variables for Dynamics CRM connection")
         
-        self.access_token = self._get_access_token()
-
-    def _get_access_token(self) -> str:
-        """Get access token for Dynamics 365 CRM."""
-        app = msal.ConfidentialClientApplication(
+        # One MSAL app per client so its in-memory token cache is reused
+        self._msal_app = msal.ConfidentialClientApplication(
             client_id=self.client_id,
             authority=f"https://login.microsoftonline.com/{self.tenant_id}",
-            client_credential=self.client_secret
+            client_credential=self.client_secret,
+            token_cache=msal.TokenCache()
         )
+        self._token_lock = threading.Lock()
+        self._access_token = None
+        self._token_expires_at = 0.0
+        
+        self.session = self._create_session()
+        self.replica = CRMReplica() if REPLICA_ENABLED else None
+        # One thread at a time follows the shared delta links
+        self._tracking_lock = threading.Lock()
         
-        result = app.acquire_token_for_client(scopes=self.scope)
+        # Acquire a token up front so configuration errors surface immediately
+        self._refresh_access_token()
+
+    @property
+    def access_token(self) -> str:
+        """Current access token, refreshed shortly before it expires."""
+        if time.time() >= self._token_expires_at - TOKEN_REFRESH_MARGIN:
+            with self._token_lock:
+                # Another thread may have refreshed while we waited for the lock
+                if time.time() >= self._token_expires_at - TOKEN_REFRESH_MARGIN:
+                    self._refresh_access_token()
+        return self._access_token
+
+    def _refresh_access_token(self) -> None:
+        """Fetch a token (from the MSAL cache when possible) and record its expiry."""
+        result = self._get_access_token()
+        self._access_token = result["access_token"]
+        self._token_expires_at = time.time() + int(result.get("expires_in", 3600))
+        logger.debug(f"Access token valid for {int(result.get('expires_in', 3600))}s")
+
+    def _get_access_token(self) -> Dict:
+        """Get access token for Dynamics 365 CRM."""
+        result = self._msal_app.acquire_token_for_client(scopes=self.scope)
         
         if "access_token" not in result:
             raise Exception(f"Could not get access token: {result.get('error_description', '')}")
         
-        return result["access_token"]
+        return result
 
-    def _make_request(self, endpoint: str, method: str = "GET", data: Optional[Dict] = None) -> Dict:
-        """Make a request to Dynamics 365 CRM."""
-        headers = {
+    def _create_session(self) -> requests.Session:
+        """Create a keep-alive HTTP session with a connection pool sized for concurrent pulls."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _build_headers(self, page_size: Optional[int] = None, track_changes: bool = False) -> Dict[str, str]:
+        """Build the standard OData request headers."""
+        # Request formatted values for option sets, lookups, etc.
+        prefer = ['odata.include-annotations="OData.Community.Display.V1.FormattedValue"']
+        if page_size:
+            # Ask the server to cap each response page so memory stays bounded
+            prefer.append(f"odata.maxpagesize={page_size}")
+        if track_changes:
+            # Ask for an @odata.deltaLink on the last page
+            prefer.append("odata.track-changes")
+        
+        return {
             "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json",
             "Accept": "application/json",
             "OData-MaxVersion": "4.0",
             "OData-Version": "4.0",
-            # Request formatted values for option sets, lookups, etc.
-            "Prefer": 'odata.include-annotations="OData.Community.Display.V1.FormattedValue"'
+            "Prefer": ",".join(prefer)
         }
+
+    def _make_request(self, endpoint: str, method: str = "GET", data: Optional[Dict] = None,
+                      page_size: Optional[int] = None, track_changes: bool = False) -> Dict:
+        """
+        Make a request to Dynamics 365 CRM.
         
-        url = f"{self.crm_url}/api/data/v9.2/{endpoint}"
-        
-        response = requests.request(
-            method=method,
-            url=url,
-            headers=headers,
-            json=data
-        )
+        Args:
+            endpoint: Path relative to the Web API root, or an absolute URL
+                      (e.g. an @odata.nextLink returned by a previous page)
+            method: HTTP method
+            data: Optional JSON body
+            page_size: Optional odata.maxpagesize preference
+            track_changes: Request change tracking (odata.track-changes)
+        """
+        if endpoint.startswith("http"):
+            url = endpoint
+        else:
+            url = f"{self.crm_url}/api/data/v9.2/{endpoint}"
         
-        response.raise_for_status()
+        response = self._send(method, url, lambda: self._build_headers(page_size, track_changes), json=data)
         return response.json()
 
+    @staticmethod
+    def _retry_delay(response: Optional[requests.Response], attempt: int) -> float:
+        """
+        Seconds to wait before retrying.
+        
+        Uses the server's Retry-After header as-is when present (service
+        protection can ask for several minutes, and retrying sooner is just
+        throttled again), otherwise exponential back-off capped at
+        RETRY_BACKOFF_MAX with full jitter so concurrent pulls don't retry in
+        lockstep.
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return max(float(retry_after), 0.0)
+                except ValueError:
+                    try:
+                        retry_at = parsedate_to_datetime(retry_after)
+                        return max((retry_at - datetime.now(retry_at.tzinfo)).total_seconds(), 0.0)
+                    except (TypeError, ValueError):
+                        pass
+        
+        return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt))
+
+    def _send(self, method: str, url: str, build_headers: Callable[[], Dict[str, str]],
+              **kwargs) -> requests.Response:
+        """
+        Send a request through the shared rate limiter, retrying throttled and transient failures.
+        
+        Args:
+            method: HTTP method
+            url: Absolute URL
+            build_headers: Called before each attempt so a long back-off never reuses an expired token
+            **kwargs: Passed through to requests (json, data, ...)
+            
+        Returns:
+            Successful response
+        """
+        attempt = 0
+        while True:
+            request_metrics.record('rate_limit_wait_seconds', _request_bucket.acquire())
+            request_metrics.record('requests')
+            
+            response = None
+            try:
+                response = self.session.request(method=method, url=url, headers=build_headers(), **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= MAX_RETRIES:
+                    request_metrics.record('failed_requests')
+                    raise
+                request_metrics.record('transient_errors')
+                logger.warning(f"{method} request failed ({e}), retrying")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response
+                if attempt >= MAX_RETRIES:
+                    request_metrics.record('failed_requests')
+                    logger.error(f"Giving up after {attempt} retries: HTTP {response.status_code}")
+                    response.raise_for_status()
+                if response.status_code == 429:
+                    request_metrics.record('throttled_responses')
+                else:
+                    request_metrics.record('transient_errors')
+            
+            delay = self._retry_delay(response, attempt)
+            if response is not None:
+                # Hand the (possibly streamed) connection back to the pool before waiting
+                response.close()
+                if response.status_code == 429:
+                    # Service protection limits apply to the whole user, so hold back every thread
+                    _request_bucket.pause(delay)
+            
+            attempt += 1
+            request_metrics.record('retries')
+            request_metrics.record('retry_wait_seconds', delay)
+            logger.warning(f"Retrying {method} in {delay:.1f}s (attempt {attempt}/{MAX_RETRIES})"
+                           + (f" after HTTP {response.status_code}" if response is not None else ""))
+            time.sleep(delay)
+
+    def _stream_page(self, url: str, page_size: Optional[int] = None) -> Dict:
+        """
+        Fetch one collection page, parsing its ``value`` array incrementally.
+        
+        Records are decoded one at a time from the socket and appended to
+        per-column lists, so neither the raw body nor a list of record dicts
+        is ever held in memory.
+        
+        Args:
+            url: Absolute URL of the page
+            page_size: Optional odata.maxpagesize preference
+            
+        Returns:
+            Page dictionary whose ``value`` is a column name -> list mapping
+        """
+        import re
+        
+        response = self._send("GET", url, lambda: self._build_headers(page_size), stream=True)
+        try:
+            if not response.encoding:
+                response.encoding = "utf-8"
+            chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE, decode_unicode=True)
+            decoder = json.JSONDecoder()
+            
+            columns = {}
+            row_count = 0
+            buffer = ""
+            head = None
+            pos = 0
+            exhausted = False
+            
+            def read_more():
+                nonlocal buffer, pos, exhausted
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    return
+                buffer = buffer[pos:] + chunk
+                pos = 0
+            
+            # Locate the start of the "value" array, keeping what precedes it
+            while head is None:
+                match = re.search(r'"value"\s*:\s*\[', buffer)
+                if match:
+                    head = buffer[:match.start()]
+                    pos = match.end()
+                elif exhausted:
+                    # Not a collection response: fall back to a plain parse
+                    page = json.loads(buffer)
+                    return {**page, "value": self._records_to_columns(page.get("value", []))}
+                else:
+                    read_more()
+            
+            while True:
+                # Skip separators between records
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if pos >= len(buffer):
+                    if exhausted:
+                        raise ValueError("Response ended inside the value array")
+                    read_more()
+                    continue
+                if buffer[pos] == "]":
+                    pos += 1
+                    break
+                
+                try:
+                    record, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if exhausted:
+                        raise
+                    # Record is split across chunks
+                    read_more()
+                    continue
+                
+                for key, value in record.items():
+                    column = columns.get(key)
+                    if column is None:
+                        # Back-fill rows seen before this column first appeared
+                        column = columns[key] = [None] * row_count
+                    column.append(value)
+                row_count += 1
+                for column in columns.values():
+                    if len(column) < row_count:
+                        column.append(None)
+                pos = end
+            
+            # Remaining top-level members (e.g. @odata.nextLink) follow the array
+            head = head.strip()[1:].strip().rstrip(",")
+            tail = (buffer[pos:] + "".join(chunks)).strip()[:-1].strip().lstrip(",")
+            page = json.loads("{" + ",".join(part for part in (head, tail) if part) + "}")
+        finally:
+            response.close()
+        
+        page["value"] = columns
+        logger.debug(f"Streamed {row_count} records into {len(columns)} columns")
+        return page
+
+    @staticmethod
+    def _records_to_columns(records: List[Dict]) -> Dict[str, List]:
+        """Convert a list of record dicts to the column-buffer layout used when streaming."""
+        return pd.DataFrame(records).to_dict(orient="list") if records else {}
+
+    def _iter_pages(self, endpoint: Optional[str], page_size: Optional[int] = None,
+                    first_page: Optional[Dict] = None, stream: bool = False,
+                    track_changes: bool = False) -> Iterator[Dict]:
+        """
+        Iterate over every response page of a collection query.
+        
+        Follows @odata.nextLink until the server stops returning one, so large
+        result sets are not truncated at the server page size.
+        
+        Args:
+            endpoint: Collection endpoint (with query options)
+            page_size: Records per page (defaults to DYNAMICS_PAGE_SIZE)
+            first_page: Already-fetched first page (e.g. from a $batch response);
+                        iteration continues from its nextLink
+            stream: Parse each fetched page incrementally (see _stream_page); its
+                    ``value`` is then a column -> list mapping instead of records
+            track_changes: Request change tracking; the last page carries @odata.deltaLink
+            
+        Yields:
+            Raw JSON response for each page
+        """
+        page_size = page_size or PAGE_SIZE
+        next_url = endpoint
+        page_number = 0
+        
+        if first_page is not None:
+            page_number += 1
+            next_url = first_page.get("@odata.nextLink")
+            yield first_page
+            del first_page
+        
+        while next_url:
+            if stream:
+                url = next_url if next_url.startswith("http") else f"{self.crm_url}/api/data/v9.2/{next_url}"
+                page = self._stream_page(url, page_size=page_size)
+                logger.debug(f"Fetched page {page_number + 1}")
+            else:
+                page = self._make_request(next_url, page_size=page_size, track_changes=track_changes)
+                logger.debug(f"Fetched page {page_number + 1} ({len(page.get('value', []))} records)")
+            page_number += 1
+            
+            next_url = page.get("@odata.nextLink")
+            yield page
+            # Release this page before the next request is issued
+            del page
+
+    def _fetch_dataframe(self, endpoint: Optional[str], prefix: str,
+                         flatten: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+                         first_page: Optional[Dict] = None) -> pd.DataFrame:
+        """
+        Fetch every page of a collection query and assemble a single DataFrame.
+        
+        Each page is converted to a columnar chunk (and flattened) as soon as it
+        arrives, so the raw JSON of only one page is held in memory at a time.
+        With DYNAMICS_STREAM_RESPONSES enabled, pages are parsed straight into
+        column buffers and the raw JSON is never held in full.
+        
+        Args:
+            endpoint: Collection endpoint (with query options)
+            prefix: Publisher prefix to strip from column names
+            flatten: Optional function to flatten expanded entities per chunk
+            first_page: Already-fetched first page to start from
+            
+        Returns:
+            Concatenated DataFrame for all pages
+        """
+        chunks = []
+        for page in self._iter_pages(endpoint, first_page=first_page, stream=STREAM_RESPONSES):
+            chunk = self._process_response(page, prefix)
+            if flatten is not None:
+                chunk = flatten(chunk)
+            if not chunk.empty:
+                chunks.append(chunk)
+            # Drop the raw page before requesting the next one
+            del page
+        
+        if not chunks:
+            return pd.DataFrame()
+        if len(chunks) == 1:
+            return chunks[0]
+        
+        logger.debug(f"Assembling {len(chunks)} pages")
+        return pd.concat(chunks, ignore_index=True, sort=False)
+
+    @staticmethod
+    def _build_projection(column_mapping: Dict[str, str], required_columns: List[str],
+                          expansions: Dict[str, str], attributes: Dict[str, str]) -> str:
+        """
+        Build a minimal $select/$expand query from a column mapping.
+        
+        Only API columns that map to one of ``required_columns`` are requested.
+        Lookup attributes are selected explicitly as ``_<name>_value`` so their
+        GUID and formatted value still come back when $select is used.
+        
+        Args:
+            column_mapping: Flattened API column -> Excel column name
+            required_columns: Excel column names the processing step reads
+            expansions: Flattened column prefix -> navigation property
+            attributes: Flattened top-level column -> logical attribute name
+            
+        Returns:
+            Query string such as "$select=a,b&$expand=Nav($select=c,d)"
+        """
+        required = set(required_columns)
+        top_level = []
+        expanded = {navigation: [] for navigation in expansions.values()}
+        
+        for api_column, excel_column in column_mapping.items():
+            if excel_column not in required:
+                continue
+            for prefix, navigation in expansions.items():
+                if api_column.startswith(prefix):
+                    attribute = api_column[len(prefix):]
+                    if attribute not in expanded[navigation]:
+                        expanded[navigation].append(attribute)
+                    break
+            else:
+                attribute = attributes.get(api_column, api_column)
+                if attribute not in top_level:
+                    top_level.append(attribute)
+        
+        def drop_lookup_names(selected):
+            # A lookup can only be selected through its _<name>_value attribute
+            return [a for a in selected if f"_{a}_value" not in selected]
+        
+        expand_parts = []
+        for navigation, selected in expanded.items():
+            selected = drop_lookup_names(selected)
+            if selected:
+                expand_parts.append(f"{navigation}($select={','.join(selected)})")
+            else:
+                expand_parts.append(navigation)
+        
+        query = []
+        if top_level:
+            query.append(f"$select={','.join(drop_lookup_names(top_level))}")
+        query.append(f"$expand={','.join(expand_parts)}")
+        return "&".join(query)
+
+    def _event_guest_projection(self) -> str:
+        """Minimal $select/$expand for Event Guests, derived from RegistrationColumns."""
+        from utils.badges.convert_to_mail_merge_v3 import RegistrationColumns
+        
+        required_columns = [name for names in RegistrationColumns.MAPPINGS.values() for name in names]
+        return self._build_projection(
+            self.EVENT_GUEST_COLUMN_MAPPING,
+            required_columns,
+            self.EVENT_GUEST_EXPANSIONS,
+            self.EVENT_GUEST_ATTRIBUTES
+        )
+
     def get_event_guests(self, view_id: str) -> pd.DataFrame:
         """Fetch event guests data using a saved query/view."""
         # Expand to get related Contact entity data
-        # Using $select to get specific fields and $expand to get related entities
         # Note: Navigation property names are case-sensitive!
-        # Expand with all contact fields to ensure lookup fields (_aha_localclub2_value) are included
-        # When you use $select in $expand, lookup fields may not be included automatically
-        expand_query = "$expand=crca7_ExistingContact,crca7_Event($select=name)"
-        endpoint = f"crca7_eventguests?{expand_query}"
-        response = self._make_request(endpoint)
-        df = self._process_response(response, "crca7_")
-        
-        # Flatten expanded entities
-        df = self._flatten_expanded_columns(df)
+        # Only the columns used by processing are selected; lookup fields such as
+        # _aha_localclub2_value are selected explicitly so they are not dropped
+        endpoint = f"crca7_eventguests?{self._event_guest_projection()}"
+        df = self._fetch_dataframe(endpoint, "crca7_", self._flatten_expanded_columns)
         
         # Map API columns to Excel column names
         df = self._map_event_guest_columns(df)
@@ -148,11 +742,7 @@ class DynamicsCRMClient:
         else:
             endpoint = f"aha_eventguestqrcodeses?{expand_query}"
             
-        response = self._make_request(endpoint)
-        df = self._process_response(response, "aha_")
-        
-        # Flatten and map columns
-        df = self._flatten_qr_code_columns(df)
+        df = self._fetch_dataframe(endpoint, "aha_", self._flatten_qr_code_columns)
         df = self._map_qr_code_columns(df)
         
         return df
@@ -163,11 +753,7 @@ class DynamicsCRMClient:
         # Expand to get Contact, Event, and Table info
         expand_query = "$expand=aha_Contact($select=contactid),aha_Event($select=name),aha_Table($select=aha_name)"
         endpoint = f"aha_tablereservations?{expand_query}"
-        response = self._make_request(endpoint)
-        df = self._process_response(response, "aha_")
-        
-        # Flatten and map columns
-        df = self._flatten_seating_columns(df)
+        df = self._fetch_dataframe(endpoint, "aha_", self._flatten_seating_columns)
         df = self._map_seating_columns(df)
         
         return df
@@ -179,42 +765,45 @@ class DynamicsCRMClient:
         # Note: The question text is in aha_newcolumn field (not aha_name)
         expand_query = "$expand=aha_Contact($select=contactid),aha_Campaign($select=name),aha_FormQuestion($select=aha_newcolumn)"
         endpoint = f"aha_eventformresponseses?{expand_query}"
-        response = self._make_request(endpoint)
-        df = self._process_response(response, "aha_")
-        
-        # Flatten and map columns
-        df = self._flatten_form_response_columns(df)
+        df = self._fetch_dataframe(endpoint, "aha_", self._flatten_form_response_columns)
         df = self._map_form_response_columns(df)
         
         return df
 
-    def _process_response(self, response: Dict, prefix: str) -> pd.DataFrame:
-        """Process the API response into a DataFrame."""
-        records = response.get("value", [])
+    @staticmethod
+    def _normalize_records(records: List[Dict], index: Optional[pd.Index] = None) -> pd.DataFrame:
+        """
+        Build a DataFrame from OData records, preferring formatted values.
         
-        # Process each record to use formatted values where available
-        processed_records = []
-        for record in records:
-            processed_record = {}
-            formatted_suffix = "@OData.Community.Display.V1.FormattedValue"
-            
-            for key, value in record.items():
-                # Skip the @odata annotations themselves
-                if key.endswith(formatted_suffix):
-                    continue
-                
-                # Check if there's a formatted value for this field
-                formatted_key = f"{key}{formatted_suffix}"
-                if formatted_key in record:
-                    # Use the formatted value instead
-                    processed_record[key] = record[formatted_key]
-                else:
-                    # Use the raw value
-                    processed_record[key] = value
-            
-            processed_records.append(processed_record)
+        The column plan (which columns have a FormattedValue annotation) is
+        decided once from the combined schema, and each formatted column is
+        merged over its raw column in a single vectorized step.
         
-        df = pd.DataFrame(processed_records)
+        Args:
+            records: List of OData entity dictionaries
+            index: Optional index for the resulting DataFrame
+        """
+        df = pd.DataFrame(records, index=index)
+        
+        formatted_columns = [col for col in df.columns if col.endswith(FORMATTED_SUFFIX)]
+        if not formatted_columns:
+            return df
+        
+        # Use the formatted value where one was returned, else the raw value
+        merged = {}
+        for formatted_col in formatted_columns:
+            raw_col = formatted_col[:-len(FORMATTED_SUFFIX)]
+            if raw_col in df.columns:
+                merged[raw_col] = df[formatted_col].combine_first(df[raw_col])
+        
+        df = df.drop(columns=formatted_columns)
+        if merged:
+            df = df.assign(**merged)
+        return df
+
+    def _process_response(self, response: Dict, prefix: str) -> pd.DataFrame:
+        """Process the API response into a DataFrame."""
+        df = self._normalize_records(response.get("value", []))
         
         # Clean up column names - remove prefix
         if not df.empty:
@@ -222,46 +811,39 @@ class DynamicsCRMClient:
         
         return df
     
-    def _flatten_expanded_columns(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Flatten expanded entity columns from $expand queries."""
-        if df.empty:
-            return df
+    def _flatten_navigation_columns(self, df: pd.DataFrame, navigations: Dict[str, str]) -> pd.DataFrame:
+        """
+        Flatten expanded navigation property columns into prefixed columns.
         
-        formatted_suffix = "@OData.Community.Display.V1.FormattedValue"
-        
-        # Handle expanded 'crca7_ExistingContact' entity
-        if 'ExistingContact' in df.columns:
-            # Process each contact to use formatted values
-            processed_contacts = []
-            for contact in df['ExistingContact']:
-                if contact is not None and isinstance(contact, dict):
-                    processed_contact = {}
-                    for key, value in contact.items():
-                        # Skip formatted value annotations
-                        if key.endswith(formatted_suffix):
-                            continue
-                        # Check if there's a formatted value for this field
-                        formatted_key = f"{key}{formatted_suffix}"
-                        if formatted_key in contact:
-                            processed_contact[key] = contact[formatted_key]
-                        else:
-                            processed_contact[key] = value
-                    processed_contacts.append(processed_contact)
-                else:
-                    processed_contacts.append({})
+        Args:
+            df: DataFrame with expanded entities stored as dicts
+            navigations: Navigation column name -> prefix for its flattened columns
             
-            contact_df = pd.DataFrame(processed_contacts)
-            # Prefix with 'contact_' to avoid collisions
-            contact_df.columns = ['contact_' + col for col in contact_df.columns]
-            df = pd.concat([df.drop('ExistingContact', axis=1), contact_df], axis=1)
+        Returns:
+            DataFrame with each navigation column replaced by its attributes
+        """
+        present = {nav: prefix for nav, prefix in navigations.items() if nav in df.columns}
+        if df.empty or not present:
+            return df
         
-        # Handle expanded 'crca7_Event' entity (Campaign)
-        if 'Event' in df.columns:
-            event_df = pd.json_normalize(df['Event'])
-            event_df.columns = ['event_' + col for col in event_df.columns]
-            df = pd.concat([df.drop('Event', axis=1), event_df], axis=1)
+        pieces = [df.drop(columns=list(present))]
+        for nav, prefix in present.items():
+            entities = [entity if isinstance(entity, dict) else {} for entity in df[nav]]
+            entity_df = self._normalize_records(entities, index=df.index)
+            entity_df.columns = [prefix + col for col in entity_df.columns]
+            pieces.append(entity_df)
         
-        return df
+        # One concat for all navigation properties
+        return pd.concat(pieces, axis=1)
+    
+    def _flatten_expanded_columns(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Flatten expanded entity columns from $expand queries."""
+        # Handle expanded 'crca7_ExistingContact' entity (prefix with 'contact_' to avoid collisions)
+        # and expanded 'crca7_Event' entity (Campaign)
+        return self._flatten_navigation_columns(df, {
+            'ExistingContact': 'contact_',
+            'Event': 'event_',
+        })
     
     def _map_event_guest_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """Map Event Guest API columns to Excel export column names."""
@@ -278,32 +860,11 @@ class DynamicsCRMClient:
         redundant_cols = ['attendeefirstname', 'attendeelastname']
         df = df.drop(columns=[col for col in redundant_cols if col in df.columns], errors='ignore')
         
-        # Mapping from API field names to Excel export column names
-        # NOTE: Only map expanded entity fields, NOT lookup GUIDs to avoid duplicates
-        column_mapping = {
-            # Don't map eventguestid or _existingcontact_value - use expanded contact data
-            'contact_contactid': 'Contact ID',
-            'contact_aha_memberid': 'Member ID (Existing Contact) (Contact)',
-            'contact_firstname': 'First Name (Existing Contact) (Contact)',
-            'contact_lastname': 'Last Name (Existing Contact) (Contact)',
-            'contact_salutation': 'Title (Existing Contact) (Contact)',  # Honorifics field (may be null)
-            'contact_aha_title': 'Title (Existing Contact) (Contact)',  # Alternative title field
-            'contact__aha_localclub2_value': 'Local Club (Existing Contact) (Contact)',  # Lookup field GUID
-            'contact_aha_localclub2': 'Local Club (Existing Contact) (Contact)',  # Alternative mapping
-            'contact_gendercode': 'Gender (Existing Contact) (Contact)',
-            'contact_crca7_age': 'Age (Existing Contact) (Contact)',
-            # Don't map _event_value - use expanded event name
-            'event_name': 'Event',
-            'statuscode': 'Status Reason',
-            'createdon': 'Created On',
-            'name': 'Name',
-        }
-        
         # Log what columns we have before mapping
         logger.info(f"Event Guest columns BEFORE mapping: {df.columns.tolist()}")
         
         # Rename columns that exist in the DataFrame
-        rename_dict = {old: new for old, new in column_mapping.items() if old in df.columns}
+        rename_dict = {old: new for old, new in self.EVENT_GUEST_COLUMN_MAPPING.items() if old in df.columns}
         df = df.rename(columns=rename_dict)
         
         logger.info(f"Event Guest columns AFTER mapping: {df.columns.tolist()}")
@@ -321,38 +882,8 @@ class DynamicsCRMClient:
     
     def _flatten_qr_code_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """Flatten QR Code expanded columns."""
-        if df.empty:
-            return df
-        
-        formatted_suffix = "@OData.Community.Display.V1.FormattedValue"
-        
-        def process_expanded_entity(entities, prefix):
-            """Process expanded entities to use formatted values."""
-            processed = []
-            for entity in entities:
-                if entity is not None and isinstance(entity, dict):
-                    processed_entity = {}
-                    for key, value in entity.items():
-                        if key.endswith(formatted_suffix):
-                            continue
-                        formatted_key = f"{key}{formatted_suffix}"
-                        if formatted_key in entity:
-                            processed_entity[key] = entity[formatted_key]
-                        else:
-                            processed_entity[key] = value
-                    processed.append(processed_entity)
-                else:
-                    processed.append({})
-            result_df = pd.DataFrame(processed)
-            result_df.columns = [prefix + col for col in result_df.columns]
-            return result_df
-        
         # Handle direct contact reference
-        if 'EventGuestContactId' in df.columns:
-            contact_df = process_expanded_entity(df['EventGuestContactId'], 'contact_')
-            df = pd.concat([df.drop('EventGuestContactId', axis=1), contact_df], axis=1)
-        
-        return df
+        return self._flatten_navigation_columns(df, {'EventGuestContactId': 'contact_'})
     
     def _map_qr_code_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """Map QR Code API columns to Excel export column names."""
@@ -376,45 +907,11 @@ class DynamicsCRMClient:
     
     def _flatten_seating_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """Flatten Table Reservation expanded columns."""
-        if df.empty:
-            return df
-        
-        formatted_suffix = "@OData.Community.Display.V1.FormattedValue"
-        
-        def process_expanded_entity(entities, prefix):
-            """Process expanded entities to use formatted values."""
-            processed = []
-            for entity in entities:
-                if entity is not None and isinstance(entity, dict):
-                    processed_entity = {}
-                    for key, value in entity.items():
-                        if key.endswith(formatted_suffix):
-                            continue
-                        formatted_key = f"{key}{formatted_suffix}"
-                        if formatted_key in entity:
-                            processed_entity[key] = entity[formatted_key]
-                        else:
-                            processed_entity[key] = value
-                    processed.append(processed_entity)
-                else:
-                    processed.append({})
-            result_df = pd.DataFrame(processed)
-            result_df.columns = [prefix + col for col in result_df.columns]
-            return result_df
-        
-        if 'Contact' in df.columns:
-            contact_df = process_expanded_entity(df['Contact'], 'contact_')
-            df = pd.concat([df.drop('Contact', axis=1), contact_df], axis=1)
-        
-        if 'Event' in df.columns:
-            event_df = process_expanded_entity(df['Event'], 'event_')
-            df = pd.concat([df.drop('Event', axis=1), event_df], axis=1)
-        
-        if 'Table' in df.columns:
-            table_df = process_expanded_entity(df['Table'], 'table_')
-            df = pd.concat([df.drop('Table', axis=1), table_df], axis=1)
-        
-        return df
+        return self._flatten_navigation_columns(df, {
+            'Contact': 'contact_',
+            'Event': 'event_',
+            'Table': 'table_',
+        })
     
     def _map_seating_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """Map Table Reservation API columns to Excel export column names."""
@@ -457,46 +954,12 @@ class DynamicsCRMClient:
     
     def _flatten_form_response_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """Flatten Form Response expanded columns."""
-        if df.empty:
-            return df
-        
-        formatted_suffix = "@OData.Community.Display.V1.FormattedValue"
-        
-        def process_expanded_entity(entities, prefix):
-            """Process expanded entities to use formatted values."""
-            processed = []
-            for entity in entities:
-                if entity is not None and isinstance(entity, dict):
-                    processed_entity = {}
-                    for key, value in entity.items():
-                        if key.endswith(formatted_suffix):
-                            continue
-                        formatted_key = f"{key}{formatted_suffix}"
-                        if formatted_key in entity:
-                            processed_entity[key] = entity[formatted_key]
-                        else:
-                            processed_entity[key] = value
-                    processed.append(processed_entity)
-                else:
-                    processed.append({})
-            result_df = pd.DataFrame(processed)
-            result_df.columns = [prefix + col for col in result_df.columns]
-            return result_df
-        
         # Note: Navigation properties are case-sensitive!
-        if 'Contact' in df.columns:
-            contact_df = process_expanded_entity(df['Contact'], 'contact_')
-            df = pd.concat([df.drop('Contact', axis=1), contact_df], axis=1)
-        
-        if 'Campaign' in df.columns:
-            campaign_df = process_expanded_entity(df['Campaign'], 'campaign_')
-            df = pd.concat([df.drop('Campaign', axis=1), campaign_df], axis=1)
-        
-        if 'FormQuestion' in df.columns:
-            question_df = process_expanded_entity(df['FormQuestion'], 'formquestion_')
-            df = pd.concat([df.drop('FormQuestion', axis=1), question_df], axis=1)
-        
-        return df
+        return self._flatten_navigation_columns(df, {
+            'Contact': 'contact_',
+            'Campaign': 'campaign_',
+            'FormQuestion': 'formquestion_',
+        })
     
     def _map_form_response_columns(self, df: pd.DataFrame) -> pd.DataFrame:
         """Map Form Response API columns to Excel export column names."""
@@ -721,90 +1184,702 @@ class DynamicsCRMClient:
             logger.error(f"Error fetching campaign by ID: {e}")
             return None
     
-    def download_data_by_type_filtered(self, data_type: str, view_id: str, campaign_id: str) -> pd.DataFrame:
+    def download_data_by_type_filtered(self, data_type: str, view_id: str, campaign_id: str,
+                                       use_replica: Optional[bool] = None,
+                                       force_refresh: bool = False) -> pd.DataFrame:
         """
         Download data based on the type, filtered by campaign (main event + sub-events).
         
+        When the local replica is enabled only records modified since the last
+        sync are pulled and the full data set is served from the replica.
+        
         Args:
             data_type: Type of data to download
             view_id: View ID (not used when filtering by campaign)
             campaign_id: GUID of the main campaign/event
+            use_replica: Override the DYNAMICS_REPLICA_ENABLED setting
+            force_refresh: Discard the replica for this campaign and data type and pull in full
             
         Returns:
             DataFrame with filtered data
         """
         logger.info(f"Downloading {data_type} for campaign {campaign_id}")
         
+        if data_type not in CAMPAIGN_QUERIES:
+            raise ValueError(f"Unknown data type: {data_type}")
+        
+        if use_replica is None:
+            use_replica = self.replica is not None
+        
         try:
-            if data_type == "event_guests":
-                return self._get_event_guests_filtered(campaign_id)
-            elif data_type == "qr_codes":
-                # Filter QR codes by main event
-                return self.get_qr_codes(view_id, campaign_id)
-            elif data_type == "table_reservations":
-                return self._get_table_reservations_filtered(campaign_id)
-            elif data_type == "form_responses":
-                return self._get_form_responses_filtered(campaign_id)
-            else:
-                raise ValueError(f"Unknown data type: {data_type}")
+            if use_replica and self.replica is not None:
+                return self._sync_replica(data_type, campaign_id, force_refresh)
+            return self._get_filtered(data_type, campaign_id)
                 
         except Exception as e:
             logger.error(f"Error downloading {data_type} for campaign: {e}")
             raise
     
-    def _get_event_guests_filtered(self, campaign_id: str) -> pd.DataFrame:
-        """Fetch event guests filtered by campaign (main + sub-events)."""
+    def _get_filtered(self, data_type: str, campaign_id: str, modified_since: Optional[datetime] = None) -> pd.DataFrame:
+        """Fetch, flatten and map one campaign-filtered data type."""
+        endpoint = self._campaign_endpoint(data_type, campaign_id, modified_since)
+        df = self._campaign_dataframe(data_type, endpoint)
+        
+        logger.info(f"Fetched {len(df)} {data_type} records for campaign")
+        return df
+    
+    def _campaign_endpoint(self, data_type: str, campaign_id: str, modified_since: Optional[datetime] = None,
+                           record_ids: Optional[List[str]] = None) -> str:
+        """Build the collection endpoint (filter + projection) for a campaign data type."""
+        query = CAMPAIGN_QUERIES[data_type]
+        # Event Guests select only the columns used by processing (lookups via their _value attribute)
+        projection = query["expand"] or self._event_guest_projection()
+        filter_clause = self._campaign_filter(data_type, campaign_id, modified_since, record_ids)
+        return f"{query['entity_set']}?$filter={filter_clause}&{projection}"
+    
+    def _campaign_dataframe(self, data_type: str, endpoint: Optional[str] = None,
+                            first_page: Optional[Dict] = None) -> pd.DataFrame:
+        """Page through a campaign query and convert it to the mapped DataFrame for its type."""
+        processors = {
+            "event_guests": (self._flatten_expanded_columns, self._map_event_guest_columns),
+            "qr_codes": (self._flatten_qr_code_columns, self._map_qr_code_columns),
+            "table_reservations": (self._flatten_seating_columns, self._map_seating_columns),
+            "form_responses": (self._flatten_form_response_columns, self._map_form_response_columns),
+        }
+        flatten, map_columns = processors[data_type]
+        df = self._fetch_dataframe(endpoint, CAMPAIGN_QUERIES[data_type]["prefix"], flatten, first_page=first_page)
+        return map_columns(df)
+    
+    def _campaign_filter(self, data_type: str, campaign_id: str, modified_since: Optional[datetime] = None,
+                         record_ids: Optional[List[str]] = None) -> str:
+        """Build the URL-encoded $filter value for a campaign query (optionally limited to some records)."""
         import urllib.parse
         
-        # Filter: Event is the main campaign OR Event's parent is the main campaign
-        # Note: crca7_Event links to campaign entity, so use campaignid
-        filter_clause = f"crca7_Event/campaignid eq {campaign_id} or crca7_Event/_aha_parentcampaign_value eq {campaign_id}"
-        # Expand with all contact fields to ensure lookup fields (_aha_localclub2_value) are included
-        # When you use $select in $expand, lookup fields may not be included automatically
-        expand_query = "$expand=crca7_ExistingContact,crca7_Event($select=name)"
+        query = CAMPAIGN_QUERIES[data_type]
+        filter_clause = query["filter"].format(campaign_id=campaign_id)
+        if modified_since is not None:
+            filter_clause = f"({filter_clause}) and modifiedon gt {modified_since.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+        if record_ids:
+            values = ",".join(f"'{record_id}'" for record_id in record_ids)
+            filter_clause = (f"({filter_clause}) and Microsoft.Dynamics.CRM.In"
+                             f"(PropertyName='{query['primary_key']}',PropertyValues=[{values}])")
+        return urllib.parse.quote(filter_clause)
+    
+    def _campaign_ids_endpoint(self, data_type: str, campaign_id: str) -> str:
+        """Build an endpoint returning only the primary keys of a campaign's records."""
+        query = CAMPAIGN_QUERIES[data_type]
+        return (f"{query['entity_set']}?$filter={self._campaign_filter(data_type, campaign_id)}"
+                f"&$select={query['primary_key']}")
+    
+    def _fetch_campaign_ids(self, data_type: str, campaign_id: str, first_page: Optional[Dict] = None) -> List[str]:
+        """Fetch only the primary keys of every record in a campaign (used to detect deletes)."""
+        primary_key = CAMPAIGN_QUERIES[data_type]["primary_key"]
+        endpoint = None if first_page else self._campaign_ids_endpoint(data_type, campaign_id)
+        
+        ids = []
+        for page in self._iter_pages(endpoint, first_page=first_page):
+            ids.extend(record[primary_key] for record in page.get("value", []))
+        return ids
+    
+    def _full_sync_due(self, data_type: str, campaign_id: str, force_refresh: bool = False) -> bool:
+        """
+        Decide whether a campaign's replica must be re-pulled in full.
         
-        endpoint = f"crca7_eventguests?$filter={urllib.parse.quote(filter_clause)}&{expand_query}"
-        response = self._make_request(endpoint)
-        df = self._process_response(response, "crca7_")
+        Forcing a refresh also discards the stored rows for the campaign and
+        data type.
+        """
+        if force_refresh:
+            self.replica.clear(campaign_id, data_type)
+            return True
+        full_sync = self.replica.get_full_sync(campaign_id, data_type)
+        if full_sync is None:
+            return True
+        age = (datetime.utcnow() - full_sync).total_seconds()
+        if age > REPLICA_FULL_SYNC_SECONDS:
+            logger.info(f"Last full sync of {data_type} is {age:.0f}s old, refreshing related columns")
+            return True
+        return False
+    
+    def _sync_replica(self, data_type: str, campaign_id: str, force_refresh: bool = False) -> pd.DataFrame:
+        """
+        Bring the local replica up to date and return its contents.
+        
+        The first pull for a campaign is a full download, and so is any pull
+        once the last full one is older than REPLICA_FULL_SYNC_SECONDS (or when
+        forced). With change tracking, other pulls follow the entity set's
+        shared delta link and re-fetch only the records queued for this
+        campaign; with no changes that is a single small request. Otherwise
+        they request rows with modifiedon after the last sync, plus the
+        current list of primary keys so deleted records can be removed.
+        """
+        last_sync = None
+        if not self._full_sync_due(data_type, campaign_id, force_refresh):
+            last_sync = self.replica.get_last_sync(campaign_id, data_type)
+        synced_at = datetime.utcnow() - timedelta(seconds=REPLICA_SYNC_OVERLAP_SECONDS)
+        
+        if last_sync is not None and CHANGE_TRACKING:
+            try:
+                if self._poll_tracked_changes(data_type):
+                    return self._sync_replica_changes(data_type, campaign_id, synced_at)
+            except requests.exceptions.HTTPError as e:
+                # Delta tokens expire (e.g. after change-tracking retention); every campaign starts over
+                logger.warning(f"Delta link for {data_type} rejected ({e}), performing full sync")
+                self.replica.save_tracking_link(CAMPAIGN_QUERIES[data_type]["entity_set"], None)
+                self.replica.expire_full_syncs(data_type)
+                last_sync = None
+        
+        if last_sync is None:
+            logger.info(f"Performing full sync of {data_type}")
+            if CHANGE_TRACKING:
+                self._start_change_tracking(data_type)
+            df = self._get_filtered(data_type, campaign_id)
+            live_ids = None
+        else:
+            logger.info(f"Syncing {data_type} changes since {last_sync.isoformat()}Z")
+            df = self._get_filtered(data_type, campaign_id, modified_since=last_sync)
+            live_ids = self._fetch_campaign_ids(data_type, campaign_id)
         
-        df = self._flatten_expanded_columns(df)
-        df = self._map_event_guest_columns(df)
+        return self._apply_replica_sync(data_type, campaign_id, df, live_ids, synced_at)
+    
+    def _start_change_tracking(self, data_type: str) -> Optional[str]:
+        """
+        Start tracking changes to an entity set unless its shared delta link exists.
         
-        logger.info(f"Fetched {len(df)} event guests for campaign")
-        return df
+        Called before a full pull so that nothing changed in between is missed
+        (rows seen twice are simply upserted again).
+        """
+        query = CAMPAIGN_QUERIES[data_type]
+        with self._tracking_lock:
+            delta_link = self.replica.get_tracking_link(query["entity_set"])
+            if delta_link:
+                return delta_link
+            
+            endpoint = f"{query['entity_set']}?$select={query['primary_key']}"
+            try:
+                for page in self._iter_pages(endpoint, track_changes=True):
+                    delta_link = page.get("@odata.deltaLink", delta_link)
+            except requests.exceptions.HTTPError as e:
+                logger.warning(f"Change tracking unavailable for {query['entity_set']}: {e}")
+                return None
+            
+            if not delta_link:
+                logger.warning(f"{query['entity_set']} returned no delta link; is change tracking enabled for it?")
+            self.replica.save_tracking_link(query["entity_set"], delta_link)
+        return delta_link
     
-    def _get_table_reservations_filtered(self, campaign_id: str) -> pd.DataFrame:
-        """Fetch table reservations filtered by campaign (main + sub-events)."""
+    def _poll_changes(self, data_type: str, delta_link: str) -> Tuple[List[str], List[str], Optional[str]]:
+        """
+        Follow a delta link.
+        
+        Returns:
+            Tuple of (changed primary keys, deleted primary keys, next delta link)
+        """
+        primary_key = CAMPAIGN_QUERIES[data_type]["primary_key"]
+        changed_ids = []
+        deleted_ids = []
+        next_link = None
+        
+        for page in self._iter_pages(delta_link, track_changes=True):
+            for record in page.get("value", []):
+                if "$deletedEntity" in record.get("@odata.context", ""):
+                    deleted_ids.append(record["id"])
+                elif primary_key in record:
+                    changed_ids.append(record[primary_key])
+            next_link = page.get("@odata.deltaLink", next_link)
+        
+        return changed_ids, deleted_ids, next_link
+    
+    def _poll_tracked_changes(self, data_type: str) -> bool:
+        """
+        Follow the entity set's shared delta link and queue its changes for the affected campaigns.
+        
+        Returns:
+            False if the entity set has no delta link (change tracking not started)
+        """
+        entity_set = CAMPAIGN_QUERIES[data_type]["entity_set"]
+        with self._tracking_lock:
+            delta_link = self.replica.get_tracking_link(entity_set)
+            if not delta_link:
+                return False
+            
+            changed_ids, deleted_ids, next_link = self._poll_changes(data_type, delta_link)
+            if changed_ids or deleted_ids:
+                logger.info(f"Change tracking for {data_type}: {len(changed_ids)} changed, {len(deleted_ids)} deleted")
+                self._queue_changes(data_type, changed_ids, deleted_ids)
+            if next_link and next_link != delta_link:
+                self.replica.save_tracking_link(entity_set, next_link)
+        return True
+    
+    def _queue_changes(self, data_type: str, changed_ids: List[str], deleted_ids: List[str]) -> None:
+        """
+        Queue changed and deleted records for the replicated campaigns they affect.
+        
+        A changed record affects the campaigns it belongs to now (looked up
+        once for all campaigns) and any campaign whose replica holds it, so
+        records moved out of a campaign are removed there too.
+        """
+        campaigns = {campaign_id.lower(): campaign_id for campaign_id in self.replica.campaigns(data_type)}
+        if not campaigns:
+            return
+        holders = self.replica.row_campaigns(data_type, changed_ids + deleted_ids)
+        members = self._record_campaigns(data_type, changed_ids)
+        
+        changes = []
+        for row_id in deleted_ids:
+            changes.extend((campaign_id, row_id, True) for campaign_id in holders.get(str(row_id), ()))
+        for row_id in changed_ids:
+            targets = {campaigns[campaign_id] for campaign_id in members.get(row_id, ()) if campaign_id in campaigns}
+            targets |= holders.get(str(row_id), set())
+            changes.extend((campaign_id, row_id, False) for campaign_id in targets)
+        
+        self.replica.add_pending(data_type, changes)
+        logger.info(f"Queued {len(changes)} {data_type} changes across "
+                    f"{len({campaign_id for campaign_id, _, _ in changes})} campaigns")
+    
+    def _record_campaigns(self, data_type: str, record_ids: List[str]) -> Dict[str, Set[str]]:
+        """Look up the campaign IDs (lowercase) each record belongs to, per the campaign filter."""
         import urllib.parse
         
-        # Filter: Event is the main campaign OR Event's parent is the main campaign
-        filter_clause = f"aha_Event/campaignid eq {campaign_id} or aha_Event/_aha_parentcampaign_value eq {campaign_id}"
-        expand_query = "$expand=aha_Contact($select=contactid),aha_Event($select=name),aha_Table($select=aha_name)"
+        query = CAMPAIGN_QUERIES[data_type]
+        navigation, attributes = query["membership"]
+        if navigation:
+            projection = f"$select={query['primary_key']}&$expand={navigation}($select={','.join(attributes)})"
+        else:
+            projection = f"$select={','.join([query['primary_key']] + attributes)}"
+        
+        members = {}
+        for start in range(0, len(record_ids), CHANGE_FETCH_BATCH_SIZE):
+            batch_ids = record_ids[start:start + CHANGE_FETCH_BATCH_SIZE]
+            values = ",".join(f"'{record_id}'" for record_id in batch_ids)
+            filter_clause = urllib.parse.quote(
+                f"Microsoft.Dynamics.CRM.In(PropertyName='{query['primary_key']}',PropertyValues=[{values}])")
+            endpoint = f"{query['entity_set']}?$filter={filter_clause}&{projection}"
+            for page in self._iter_pages(endpoint):
+                for record in page.get("value", []):
+                    source = (record.get(navigation) or {}) if navigation else record
+                    members[record[query["primary_key"]]] = {
+                        str(source[attribute]).lower() for attribute in attributes if source.get(attribute)
+                    }
+        return members
+    
+    def _sync_replica_changes(self, data_type: str, campaign_id: str, synced_at: datetime) -> pd.DataFrame:
+        """Apply the changes queued for a campaign to the replica and return its contents."""
+        changed_ids, deleted_ids, queue_position = self.replica.get_pending(campaign_id, data_type)
+        
+        # Re-fetch changed rows through the campaign filter
+        query = CAMPAIGN_QUERIES[data_type]
+        key_column = query["primary_key"].replace(query["prefix"], "")
+        chunks = []
+        for start in range(0, len(changed_ids), CHANGE_FETCH_BATCH_SIZE):
+            batch_ids = changed_ids[start:start + CHANGE_FETCH_BATCH_SIZE]
+            endpoint = self._campaign_endpoint(data_type, campaign_id, record_ids=batch_ids)
+            chunk = self._campaign_dataframe(data_type, endpoint)
+            if not chunk.empty:
+                chunks.append(chunk)
+        changed_df = pd.concat(chunks, ignore_index=True, sort=False) if chunks else pd.DataFrame()
+        
+        # Changed records that no longer match the campaign filter leave the replica
+        in_campaign = set(changed_df[key_column].astype(str)) if not changed_df.empty else set()
+        removed_ids = set(deleted_ids) | (set(changed_ids) - in_campaign)
+        
+        self.replica.apply_changes(campaign_id, data_type, changed_df, key_column, removed_ids, synced_at)
+        self.replica.clear_pending(campaign_id, data_type, queue_position)
+        
+        df = self.replica.load(campaign_id, data_type)
+        logger.info(f"Serving {len(df)} {data_type} records from replica")
+        return df
+    
+    def _apply_replica_sync(self, data_type: str, campaign_id: str, df: pd.DataFrame,
+                            live_ids: Optional[List[str]], synced_at: datetime) -> pd.DataFrame:
+        """
+        Store a pull in the replica and return the replica's contents.
         
-        endpoint = f"aha_tablereservations?$filter={urllib.parse.quote(filter_clause)}&{expand_query}"
-        response = self._make_request(endpoint)
-        df = self._process_response(response, "aha_")
+        Args:
+            df: Full pull (when live_ids is None) or rows changed since the last sync
+            live_ids: Primary keys currently in the campaign, for delta pulls
+            synced_at: Time to record as the new sync point
+        """
+        query = CAMPAIGN_QUERIES[data_type]
+        key_column = query["primary_key"].replace(query["prefix"], "")
         
-        df = self._flatten_seating_columns(df)
-        df = self._map_seating_columns(df)
+        if live_ids is None:
+            self.replica.replace(campaign_id, data_type, df, key_column, synced_at)
+        else:
+            self.replica.apply_delta(campaign_id, data_type, df, key_column, live_ids, synced_at)
         
-        logger.info(f"Fetched {len(df)} table reservations for campaign")
+        df = self.replica.load(campaign_id, data_type)
+        logger.info(f"Serving {len(df)} {data_type} records from replica")
         return df
     
-    def _get_form_responses_filtered(self, campaign_id: str) -> pd.DataFrame:
-        """Fetch form responses filtered by campaign (main + sub-events)."""
+    def download_all_data_filtered(self, campaign_id: str, data_types: Optional[List[str]] = None,
+                                   max_workers: int = 4, force_refresh: bool = False) -> Dict[str, pd.DataFrame]:
+        """
+        Download several datasets for a campaign concurrently.
+        
+        All queries share this client's access token and run on a thread pool,
+        so the total latency is that of the slowest query rather than the sum.
+        A failure in one dataset does not cancel the others.
+        
+        Args:
+            campaign_id: GUID of the main campaign/event
+            data_types: Data types to pull (defaults to CAMPAIGN_DATA_TYPES)
+            max_workers: Maximum number of concurrent queries
+            force_refresh: Ignore the replica and pull every dataset in full
+            
+        Returns:
+            Dictionary mapping data type to DataFrame
+            
+        Raises:
+            DataPullError: If any dataset failed (successful results are attached)
+        """
+        data_types = data_types or CAMPAIGN_DATA_TYPES
+        results = {}
+        failures = {}
+        timings = {}
+        
+        def pull(data_type):
+            start = time.perf_counter()
+            try:
+                return self.download_data_by_type_filtered(data_type, None, campaign_id,
+                                                           force_refresh=force_refresh)
+            finally:
+                timings[data_type] = time.perf_counter() - start
+        
+        overall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(data_types))) as executor:
+            futures = {executor.submit(pull, data_type): data_type for data_type in data_types}
+            for future in as_completed(futures):
+                data_type = futures[future]
+                try:
+                    results[data_type] = future.result()
+                    logger.info(f"Pulled {len(results[data_type])} {data_type} records in {timings[data_type]:.2f}s")
+                except Exception as e:
+                    failures[data_type] = e
+                    logger.error(f"Failed to pull {data_type} after {timings.get(data_type, 0):.2f}s: {e}")
+        
+        logger.info(f"Concurrent pull of {len(data_types)} datasets finished in {time.perf_counter() - overall_start:.2f}s")
+        self.last_pull_timings = timings
+        
+        if failures:
+            raise DataPullError(failures, results, timings)
+        
+        # Preserve the requested ordering
+        return {data_type: results[data_type] for data_type in data_types}
+    
+    # ========== $batch Support ==========
+    
+    def _batch(self, operations: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Submit several GET requests as one OData $batch request.
+        
+        Dataverse executes the operations in order and returns one multipart
+        response, so the whole set costs a single round trip.
+        
+        Args:
+            operations: Key -> endpoint (relative to the Web API root)
+            
+        Returns:
+            Key -> parsed JSON body, or a BatchPartError for failed operations
+        """
+        import uuid
+        
+        api_root = f"{self.crm_url}/api/data/v9.2/"
+        boundary = f"batch_{uuid.uuid4()}"
+        part_headers = self._build_headers(PAGE_SIZE)
+        
+        lines = []
+        for endpoint in operations.values():
+            lines += [
+                f"--{boundary}",
+                "Content-Type: application/http",
+                "Content-Transfer-Encoding: binary",
+                "",
+                f"GET {api_root}{endpoint} HTTP/1.1",
+                f"Accept: {part_headers['Accept']}",
+                f"Prefer: {part_headers['Prefer']}",
+                "",
+            ]
+        lines += [f"--{boundary}--", ""]
+        
+        def build_headers():
+            headers = self._build_headers()
+            headers["Content-Type"] = f"multipart/mixed; boundary={boundary}"
+            return headers
+        
+        start = time.perf_counter()
+        response = self._send("POST", f"{api_root}$batch", build_headers, data="\r\n".join(lines).encode("utf-8"))
+        logger.info(f"$batch of {len(operations)} requests completed in {time.perf_counter() - start:.2f}s")
+        
+        parts = self._parse_batch_response(response.headers.get("Content-Type", ""), response.text)
+        if len(parts) != len(operations):
+            raise Exception(f"$batch returned {len(parts)} responses for {len(operations)} requests")
+        
+        return dict(zip(operations.keys(), parts))
+    
+    @staticmethod
+    def _parse_batch_response(content_type: str, body: str) -> List[Any]:
+        """
+        Split a multipart/mixed $batch response into per-operation results.
+        
+        Returns:
+            Parsed JSON body for each successful part, BatchPartError otherwise
+        """
+        boundary = None
+        for param in content_type.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "boundary":
+                boundary = value.strip('"')
+        if not boundary:
+            raise Exception(f"No boundary in $batch response Content-Type: {content_type}")
+        
+        results = []
+        body = body.replace("\r\n", "\n")
+        for part in body.split(f"--{boundary}")[1:]:
+            if part.startswith("--"):
+                break
+            
+            # Part MIME headers, then the embedded HTTP response (status line, headers, body)
+            _, _, http_response = part.strip("\n").partition("\n\n")
+            head, _, payload = http_response.partition("\n\n")
+            status_line = head.split("\n", 1)[0]
+            status_code = int(status_line.split(" ")[1])
+            payload = payload.strip()
+            
+            if status_code >= 400:
+                try:
+                    message = json.loads(payload).get("error", {}).get("message", payload)
+                except ValueError:
+                    message = payload or status_line
+                results.append(BatchPartError(status_code, message))
+            else:
+                results.append(json.loads(payload) if payload else {})
+        
+        return results
+    
+    def download_campaign_batch(self, campaign_id: str, data_types: Optional[List[str]] = None,
+                                include_sub_events: bool = True,
+                                use_replica: Optional[bool] = None,
+                                force_refresh: bool = False) -> Dict[str, Any]:
+        """
+        Fetch campaign metadata and every dataset for a badge run in one $batch request.
+        
+        Only the first page of each query travels in the batch; any further
+        pages are followed with ordinary requests via @odata.nextLink. When the
+        replica is enabled the batch carries the delta and primary-key queries
+        instead of full pulls.
+        
+        Args:
+            campaign_id: GUID of the main campaign/event
+            data_types: Data types to pull (defaults to CAMPAIGN_DATA_TYPES)
+            include_sub_events: Also return the campaign's sub-events
+            use_replica: Override the DYNAMICS_REPLICA_ENABLED setting
+            force_refresh: Ignore the replica and pull every dataset in full
+            
+        Returns:
+            Dictionary with 'campaign' ({'id', 'name'} or None), 'sub_events'
+            (list of {'id', 'name'}) and 'datasets' (data type -> DataFrame)
+            
+        Raises:
+            DataPullError: If any dataset failed (successful results are attached)
+        """
         import urllib.parse
         
-        # Filter: Campaign is the main campaign OR Campaign's parent is the main campaign
-        filter_clause = f"aha_Campaign/campaignid eq {campaign_id} or aha_Campaign/_aha_parentcampaign_value eq {campaign_id}"
-        expand_query = "$expand=aha_Contact($select=contactid),aha_Campaign($select=name),aha_FormQuestion($select=aha_newcolumn)"
+        data_types = data_types or CAMPAIGN_DATA_TYPES
+        for data_type in data_types:
+            if data_type not in CAMPAIGN_QUERIES:
+                raise ValueError(f"Unsupported data type: {data_type}")
+        
+        if use_replica is None:
+            use_replica = self.replica is not None
+        use_replica = use_replica and self.replica is not None
+        
+        operations = {"campaign": f"campaigns({campaign_id})?$select=campaignid,name"}
+        if include_sub_events:
+            filter_clause = urllib.parse.quote(f"_aha_parentcampaign_value eq {campaign_id}")
+            operations["sub_events"] = f"campaigns?$filter={filter_clause}&$select=campaignid,name&$orderby=name"
+        
+        last_syncs = {}
+        synced_at = datetime.utcnow() - timedelta(seconds=REPLICA_SYNC_OVERLAP_SECONDS)
+        for data_type in data_types:
+            last_sync = None
+            if use_replica and not self._full_sync_due(data_type, campaign_id, force_refresh):
+                last_sync = self.replica.get_last_sync(campaign_id, data_type)
+            last_syncs[data_type] = last_sync
+            operations[data_type] = self._campaign_endpoint(data_type, campaign_id, last_sync)
+            if last_sync is not None:
+                operations[f"{data_type}:ids"] = self._campaign_ids_endpoint(data_type, campaign_id)
+        
+        start = time.perf_counter()
+        responses = self._batch(operations)
+        
+        campaign = responses["campaign"]
+        if isinstance(campaign, BatchPartError):
+            logger.error(f"Error fetching campaign by ID in batch: {campaign}")
+            campaign = None
+        else:
+            campaign = {'id': campaign.get('campaignid'), 'name': campaign.get('name')}
+        
+        sub_events = []
+        if include_sub_events:
+            if isinstance(responses["sub_events"], BatchPartError):
+                raise responses["sub_events"]
+            sub_events = [{'id': event.get('campaignid'), 'name': event.get('name')}
+                          for event in responses["sub_events"].get('value', [])]
+        
+        results = {}
+        failures = {}
+        for data_type in data_types:
+            try:
+                first_page = responses[data_type]
+                ids_page = responses.get(f"{data_type}:ids")
+                for page in (first_page, ids_page):
+                    if isinstance(page, BatchPartError):
+                        raise page
+                
+                df = self._campaign_dataframe(data_type, first_page=first_page)
+                if use_replica:
+                    live_ids = None
+                    if last_syncs[data_type] is not None:
+                        live_ids = self._fetch_campaign_ids(data_type, campaign_id, first_page=ids_page)
+                    # The shared change-tracking links are left alone; queued changes are re-applied later
+                    df = self._apply_replica_sync(data_type, campaign_id, df, live_ids, synced_at)
+                results[data_type] = df
+                logger.info(f"Pulled {len(df)} {data_type} records via $batch")
+            except Exception as e:
+                failures[data_type] = e
+                logger.error(f"Failed to pull {data_type} via $batch: {e}")
+        
+        timings = {"batch": time.perf_counter() - start}
+        self.last_pull_timings = timings
+        
+        if failures:
+            raise DataPullError(failures, results, timings)
+        
+        return {
+            'campaign': campaign,
+            'sub_events': sub_events,
+            'datasets': {data_type: results[data_type] for data_type in data_types}
+        }
+    
+    # ========== FetchXML Aggregation ==========
+    
+    def _fetch_aggregate(self, entity_set: str, fetch_xml: str) -> pd.DataFrame:
+        """
+        Run an aggregate FetchXML query and return its rows.
         
-        endpoint = f"aha_eventformresponseses?$filter={urllib.parse.quote(filter_clause)}&{expand_query}"
-        response = self._make_request(endpoint)
-        df = self._process_response(response, "aha_")
+        Grouped lookups and option sets come back as their display names
+        (via the FormattedValue annotation) rather than GUIDs or codes.
         
-        df = self._flatten_form_response_columns(df)
-        df = self._map_form_response_columns(df)
+        Args:
+            entity_set: Entity set name the query runs against
+            fetch_xml: FetchXML document with aggregate="true"
+        """
+        import urllib.parse
+        
+        response = self._make_request(f"{entity_set}?fetchXml={urllib.parse.quote(fetch_xml)}")
+        return self._normalize_records(response.get("value", []))
+    
+    @staticmethod
+    def _campaign_link_filter(campaign_id: str) -> str:
+        """FetchXML filter matching a campaign and its sub-events."""
+        return (
+            '<filter type="or">'
+            f'<condition attribute="campaignid" operator="eq" value="{campaign_id}"/>'
+            f'<condition attribute="aha_parentcampaign" operator="eq" value="{campaign_id}"/>'
+            '</filter>'
+        )
+    
+    def get_registration_counts(self, campaign_id: str, by_club: bool = False) -> pd.DataFrame:
+        """
+        Count event guests per sub-event and status (optionally per local club) on the server.
+        
+        Args:
+            campaign_id: GUID of the main campaign/event
+            by_club: Also group by the contact's local club
+            
+        Returns:
+            DataFrame with columns Event, Status[, Local Club], Count
+        """
+        club_link = ""
+        if by_club:
+            club_link = (
+                '<link-entity name="contact" from="contactid" to="crca7_existingcontact" link-type="outer">'
+                '<attribute name="aha_localclub2" alias="club" groupby="true"/>'
+                '</link-entity>'
+            )
+        
+        fetch_xml = (
+            '<fetch aggregate="true">'
+            '<entity name="crca7_eventguest">'
+            '<attribute name="crca7_eventguestid" alias="count" aggregate="count"/>'
+            '<attribute name="crca7_event" alias="event" groupby="true"/>'
+            '<attribute name="statuscode" alias="status" groupby="true"/>'
+            '<link-entity name="campaign" from="campaignid" to="crca7_event" link-type="inner">'
+            f'{self._campaign_link_filter(campaign_id)}'
+            '</link-entity>'
+            f'{club_link}'
+            '</entity>'
+            '</fetch>'
+        )
+        
+        df = self._fetch_aggregate(CAMPAIGN_QUERIES["event_guests"]["entity_set"], fetch_xml)
+        columns = {'event': 'Event', 'status': 'Status', 'club': 'Local Club', 'count': 'Count'}
+        df = df.reindex(columns=[alias for alias in columns if alias != 'club' or by_club]).rename(columns=columns)
+        
+        logger.info(f"Fetched {len(df)} registration count rows for campaign")
+        return df
+    
+    def get_form_response_counts(self, campaign_id: str) -> pd.DataFrame:
+        """
+        Count form responses per sub-event, question and answer on the server.
+        
+        Args:
+            campaign_id: GUID of the main campaign/event
+            
+        Returns:
+            DataFrame with columns Event, Question, Response, Count
+        """
+        fetch_xml = (
+            '<fetch aggregate="true">'
+            '<entity name="aha_eventformresponses">'
+            '<attribute name="aha_eventformresponsesid" alias="count" aggregate="count"/>'
+            '<attribute name="aha_campaign" alias="event" groupby="true"/>'
+            '<attribute name="aha_guestresponse" alias="response" groupby="true"/>'
+            '<link-entity name="campaign" from="campaignid" to="aha_campaign" link-type="inner">'
+            f'{self._campaign_link_filter(campaign_id)}'
+            '</link-entity>'
+            '<link-entity name="aha_formquestion" from="aha_formquestionid" to="aha_formquestion" link-type="outer">'
+            '<attribute name="aha_newcolumn" alias="question" groupby="true"/>'
+            '</link-entity>'
+            '</entity>'
+            '</fetch>'
+        )
+        
+        df = self._fetch_aggregate(CAMPAIGN_QUERIES["form_responses"]["entity_set"], fetch_xml)
+        columns = {'event': 'Event', 'question': 'Question', 'response': 'Response', 'count': 'Count'}
+        df = df.reindex(columns=list(columns)).rename(columns=columns)
         
-        logger.info(f"Fetched {len(df)} form responses for campaign")
-        return df 
\ No newline at end of file
+        logger.info(f"Fetched {len(df)} form response count rows for campaign")
+        return df
+    
+    def get_campaign_summary(self, campaign_id: str) -> Dict[str, pd.DataFrame]:
+        """
+        Headcounts for a campaign computed by Dataverse instead of pulling every row.
+        
+        Two aggregate queries: registrations per club, and form responses.
+        The per-status totals are summed from the per-club counts.
+        
+        Returns:
+            Dictionary with 'registrations' (Event, Status, Count), 'clubs'
+            (Event, Status, Local Club, Count) and 'form_responses'
+            (Event, Question, Response, Count) summary frames
+        """
+        clubs = self.get_registration_counts(campaign_id, by_club=True)
+        registrations = (clubs.groupby(['Event', 'Status'], dropna=False, sort=False)['Count']
+                         .sum()
+                         .reset_index())
+        return {
+            'registrations': registrations,
+            'clubs': clubs,
+            'form_responses': self.get_form_response_counts(campaign_id),
+        }
@@ -1,9 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
+import time
 import re
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 import pytz
 from io import StringIO
 from contextlib import redirect_stdout
@@ -397,6 +399,35 @@ class ScheduleManager:
             name=f'Magazine Download - {schedule.frequency} at {schedule.time}'
         )
 
+    def add_warm_cache_job(self, func, interval_seconds, job_id='campaign_warm_cache'):
+        """Run a cache-warming function every interval_seconds, starting right away"""
+        if interval_seconds <= 0:
+            scheduler_logger.info("Warm-cache job disabled")
+            return False
+
+        def job_wrapper():
+            start = time.time()
+            try:
+                with self.app.app_context():
+                    func()
+                job_logger.info(f"Job {job_id} completed in {time.time() - start:.1f}s")
+            except Exception as e:
+                job_logger.error(f"Error in job {job_id}: {str(e)}")
+
+        # A slow run never overlaps the next one; missed runs collapse into one
+        self.scheduler.add_job(
+            func=job_wrapper,
+            trigger=IntervalTrigger(seconds=interval_seconds),
+            id=job_id,
+            name=f'Campaign Warm Cache - every {interval_seconds}s',
+            next_run_time=datetime.now(self.scheduler.timezone),
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+        scheduler_logger.info(f"Scheduled {job_id} every {interval_seconds}s")
+        return True
+
     def remove_job(self, schedule_id):
         """Remove a job from the scheduler"""
         job_id = f'magazine_download_{schedule_id}'